@@ -0,0 +1,90 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.executor import CPUExecutor
+from app.metrics import add_request_timings, observe_stages
+from app.profiling import request_profile
+
+
+class SearchCoalescer:
+    """
+    Склейка одновременных запросов /search: запросы копятся window_ms миллисекунд
+    (или до max_batch штук) и скорятся одним вызовом search_batch - одна нормализация
+    и один проход по корпусу на пачку. Запросы с разными top_n / весами / алгоритмами идут разными пачками.
+    """
+
+    def __init__(self, executor: CPUExecutor, window_ms: float = 2.0, max_batch: int = 32):
+        self.executor = executor
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.groups: Dict[Tuple, List[Tuple[str, asyncio.Future]]] = {}
+        self.timers: Dict[Tuple, asyncio.TimerHandle] = {}
+        self.tasks = set()
+        self.batches = 0
+        self.queries = 0
+
+    async def search(
+        self,
+        query: str,
+        top_n: int,
+        weights: Optional[Dict[str, float]] = None,
+        algorithms: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        # профилируемый запрос идёт отдельно: профиль пачки смешал бы чужие запросы
+        if self.window <= 0 or self.max_batch <= 1 or request_profile.get() is not None:
+            return await self.executor.run(
+                "search", query=query, top_n=top_n, weights=weights, algorithms=algorithms
+            )
+
+        loop = asyncio.get_running_loop()
+        key = (
+            top_n,
+            tuple(sorted(weights.items())) if weights else None,
+            tuple(algorithms) if algorithms else None,
+        )
+        future = loop.create_future()
+        group = self.groups.setdefault(key, [])
+        group.append((query, future))
+
+        if len(group) >= self.max_batch:
+            self.__flush(key)
+        elif len(group) == 1:
+            self.timers[key] = loop.call_later(self.window, self.__flush, key)
+        objects, timings = await future
+        # этапы пачки - общие для всех её запросов
+        add_request_timings(timings)
+        return objects
+
+    def __flush(self, key: Tuple):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self.groups.pop(key, None)
+        if not group:
+            return
+        task = asyncio.ensure_future(self.__run(key, group))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def __run(self, key: Tuple, group: List[Tuple[str, asyncio.Future]]):
+        top_n, weights, algorithms = key
+        self.batches += 1
+        self.queries += len(group)
+        try:
+            results, timings = await self.executor.run_timed(
+                "search_batch",
+                queries=[query for query, _ in group],
+                top_n=top_n,
+                weights=dict(weights) if weights is not None else None,
+                algorithms=list(algorithms) if algorithms is not None else None,
+            )
+        except Exception as exc:
+            # 503 от пула или ошибка поиска - всем ожидающим запросам пачки
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        observe_stages(timings)
+        for (_, future), objects in zip(group, results):
+            if not future.done():
+                future.set_result((objects, timings))
@@ -0,0 +1,155 @@
+import asyncio
+import codecs
+import json
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from app.executor import CPUExecutor
+from geocoder.bulk import BulkGeocoder, BulkProgress, QueryLineParser
+from geocoder.utils import BULK_CHUNK_SIZE, BULK_MAX_IN_FLIGHT
+
+# Сколько последних заданий хранить для запроса прогресса
+MAX_BULK_JOBS = 100
+
+bulk_jobs: "OrderedDict[str, BulkProgress]" = OrderedDict()
+
+
+class BulkStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse без фонового ожидания http.disconnect: тело запроса читает
+    сам генератор ответа, а фоновый слушатель забирал бы его сообщения из receive.
+    Отключение клиента обнаруживается по ошибке отправки.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def register_job() -> str:
+    job_id = uuid.uuid4().hex
+    bulk_jobs[job_id] = BulkProgress()
+    while len(bulk_jobs) > MAX_BULK_JOBS:
+        bulk_jobs.popitem(last=False)
+    return job_id
+
+
+async def iter_request_lines(request: Request) -> AsyncIterator[str]:
+    """Построчное чтение тела запроса без буферизации всего входа"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    tail = ''
+    async for data in request.stream():
+        lines = (tail + decoder.decode(data)).split('\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+async def search_chunk(
+    executor: CPUExecutor,
+    chunk: List[Tuple[int, Optional[str], Optional[str]]],
+    top_n: int,
+    weights: Optional[Dict[str, float]],
+    algorithms: Optional[List[str]],
+    progress: BulkProgress,
+) -> List[Dict[str, Any]]:
+    """
+    Пачка через общий пул поиска (search_batch, как /search/batch). Если пул перегружен (503),
+    пачка ждёт Retry-After и повторяется: пакетная обработка уступает интерактивным запросам.
+    """
+    while True:
+        try:
+            results = await executor.run(
+                "search_batch",
+                queries=BulkGeocoder.chunk_queries(chunk),
+                top_n=top_n,
+                weights=weights,
+                algorithms=algorithms,
+            )
+        except HTTPException as exc:
+            if exc.status_code != 503:
+                raise
+            await asyncio.sleep(float((exc.headers or {}).get("Retry-After", 1)))
+            continue
+        return BulkGeocoder.chunk_records(chunk, results, progress)
+
+
+async def stream_bulk(
+    lines: AsyncIterator[str],
+    executor: CPUExecutor,
+    fmt: str,
+    top_n: int,
+    weights: Optional[Dict[str, float]],
+    algorithms: Optional[List[str]],
+    progress: BulkProgress,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    max_in_flight: int = BULK_MAX_IN_FLIGHT,
+) -> AsyncIterator[bytes]:
+    """
+    Пачки скорятся в пуле поиска. Чтение тела запроса идёт в отдельной задаче, а результаты
+    выдаются по порядку, как только готова самая старая пачка. Когда max_in_flight пачек
+    ещё не отданы клиенту, чтение приостанавливается (backpressure).
+    """
+    parser = QueryLineParser(fmt)
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(max_in_flight)
+
+    async def submit(chunk):
+        await slots.acquire()
+        queue.put_nowait(asyncio.ensure_future(
+            search_chunk(executor, chunk, top_n, weights, algorithms, progress)
+        ))
+
+    async def produce():
+        chunk = []
+        line_no = 0
+        try:
+            async for line in lines:
+                line_no += 1
+                item = BulkGeocoder.parse_line(line_no, line, parser, progress)
+                if item is None:
+                    continue
+                chunk.append(item)
+                if len(chunk) >= chunk_size:
+                    await submit(chunk)
+                    chunk = []
+
+            item = BulkGeocoder.parse_line(line_no, None, parser, progress)
+            if item is not None:
+                chunk.append(item)
+            if chunk:
+                await submit(chunk)
+        except Exception as exc:
+            queue.put_nowait(exc)
+        else:
+            queue.put_nowait(None)
+
+    def encode(records) -> bytes:
+        return ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            future = await queue.get()
+            if future is None:
+                break
+            if isinstance(future, Exception):
+                raise future
+            yield encode(await future)
+            slots.release()
+        progress.finish()
+    finally:
+        # Клиент отключился или вход с ошибкой: чтение и оставшиеся пачки больше не нужны
+        producer.cancel()
+        while not queue.empty():
+            future = queue.get_nowait()
+            if isinstance(future, asyncio.Future):
+                future.cancel()
@@ -0,0 +1,47 @@
+from functools import lru_cache
+from typing import Literal, Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from geocoder.utils import DATASET_NAME
+
+
+class Settings(BaseSettings):
+    """Настройки сервиса, переопределяются переменными окружения GEOCODER_*"""
+    model_config = SettingsConfigDict(env_prefix="GEOCODER_")
+
+    dataset_path: str = "./data/" + DATASET_NAME
+    # Каталог снапшота (python -m geocoder.snapshot build); если задан, CSV не читается
+    snapshot_path: Optional[str] = None
+
+    # Пул для CPU-работы поиска: thread - общий экземпляр геокодера, process - экземпляр
+    # в каждом процессе (лучше вместе со snapshot_path); 0 воркеров - по числу CPU
+    executor: Literal["thread", "process"] = "thread"
+    executor_workers: int = 0
+    # Сколько запросов может ждать и выполняться в пуле одновременно, остальные получают 503
+    max_pending: int = 64
+    # Склейка одновременных /search в одну пачку: окно ожидания в мс (0 - выключено) и размер пачки
+    batch_window_ms: float = 2.0
+    batch_max_size: int = 32
+    # Быстрая сериализация ответов /search, /reverse, /compare и пакетных эндпоинтов через orjson
+    fast_json: bool = False
+    # Заголовок Server-Timing с длительностями этапов в каждом ответе
+    server_timing: bool = False
+    # Профилирование запросов в пуле поиска: доля случайных запросов (0 - выключено),
+    # разрешение заголовка X-Geocoder-Profile и сколько последних профилей хранить
+    profile_sample_rate: float = 0.0
+    profile_header: bool = False
+    profile_keep: int = 50
+    # Перезагрузка индекса без остановки (POST /admin/reload): слежение за изменением CSV или
+    # meta.json снапшота с опросом раз в reload_poll_s секунд и сколько последних запросов
+    # из кэша старого индекса прогнать через новый до замены
+    reload_watch: bool = False
+    reload_poll_s: float = 30.0
+    reload_warm_queries: int = 1000
+    # Токен для /admin/* (заголовок X-Admin-Token); пустой - эндпоинты /admin/* отвечают 403
+    admin_token: str = ""
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
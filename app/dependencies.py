@@ -1,7 +1,79 @@
+import secrets
 from functools import lru_cache
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.config import get_settings
 from geocoder.algorithm import GeocoderAlgorithm
 
 
 @lru_cache
+def get_holder() -> "GeocoderHolder":
+    from app.reload import GeocoderHolder
+
+    settings = get_settings()
+    return GeocoderHolder(
+        dataset_path=settings.dataset_path,
+        snapshot_path=settings.snapshot_path,
+    )
+
+
 def get_geocoder() -> GeocoderAlgorithm:
-    return GeocoderAlgorithm()
+    """Текущий экземпляр геокодера; после перезагрузки индекса - новый"""
+    return get_holder().get()
+
+
+@lru_cache
+def get_executor() -> "CPUExecutor":
+    from app.executor import CPUExecutor
+
+    settings = get_settings()
+    return CPUExecutor(
+        kind=settings.executor,
+        workers=settings.executor_workers,
+        max_pending=settings.max_pending,
+    )
+
+
+@lru_cache
+def get_coalescer() -> "SearchCoalescer":
+    from app.batching import SearchCoalescer
+
+    settings = get_settings()
+    return SearchCoalescer(
+        get_executor(),
+        window_ms=settings.batch_window_ms,
+        max_batch=settings.batch_max_size,
+    )
+
+
+@lru_cache
+def get_reloader() -> "Reloader":
+    from app.reload import Reloader
+
+    settings = get_settings()
+    return Reloader(
+        get_executor(),
+        dataset_path=settings.dataset_path,
+        snapshot_path=settings.snapshot_path,
+        warm_queries=settings.reload_warm_queries,
+        poll_s=settings.reload_poll_s,
+    )
+
+
+@lru_cache
+def get_profile_store() -> "ProfileStore":
+    from app.profiling import ProfileStore
+
+    return ProfileStore(keep=get_settings().profile_keep)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Служебные эндпоинты /admin/*: нужен заголовок X-Admin-Token, равный GEOCODER_ADMIN_TOKEN.
+    Без заданного токена эндпоинты закрыты.
+    """
+    token = get_settings().admin_token
+    if not token or x_admin_token is None or not secrets.compare_digest(x_admin_token, token):
+        raise HTTPException(status_code=403, detail="Нужен токен администратора")
@@ -0,0 +1,173 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.dependencies import get_geocoder, get_holder
+from app.metrics import record_stages
+from app.profiling import add_request_profile, request_profile
+from geocoder.profiling import Stacks, profile_stacks
+from geocoder.timing import collect_stages
+
+
+def _call(
+    method: str, args: Tuple, kwargs: Dict[str, Any], submitted_at: float, profile: bool = False
+) -> Tuple[Any, Dict[str, float], int, Dict, Optional[Stacks]]:
+    """
+    Вызов метода GeocoderAlgorithm в потоке или процессе пула (у процесса свой экземпляр).
+    Вместе с результатом возвращаются длительности этапов (включая ожидание в очереди),
+    pid исполнителя, статистика его кэша и индексов и, при profile, стеки вызовов.
+    """
+    geocoder = get_geocoder()
+    queued = time.time() - submitted_at
+    stacks = None
+    with collect_stages() as timings:
+        if profile:
+            with profile_stacks() as profiler:
+                result = getattr(geocoder, method)(*args, **kwargs)
+            stacks = profiler.stacks
+        else:
+            result = getattr(geocoder, method)(*args, **kwargs)
+    return result, {"queue": queued, **timings}, os.getpid(), geocoder.stats(), stacks
+
+
+# Ошибка загрузки индекса в инициализаторе процесса; исключение из инициализатора
+# сломало бы пул (BrokenProcessPool) без исходного сообщения, поэтому оно отдаётся из _warmup
+_reload_error: Optional[Exception] = None
+
+
+def _warmup(_=None) -> int:
+    if _reload_error is not None:
+        raise _reload_error
+    get_geocoder()
+    return os.getpid()
+
+
+def _reload(dataset_path: str, snapshot_path: Optional[str], warm_keys: List[Tuple]):
+    """Инициализация процесса нового пула: индекс из нового источника с прогретым кэшем"""
+    global _reload_error
+    try:
+        get_holder().reload(dataset_path, snapshot_path, warm_keys)
+    except Exception as exc:
+        _reload_error = exc
+
+
+def _cache_keys(limit: int) -> List[Tuple]:
+    return get_holder().cache_keys(limit)
+
+
+class CPUExecutor:
+    """
+    Пул для CPU-работы поиска с ограничением допуска: если в очереди и в работе уже
+    max_pending запросов, новый сразу получает 503, а не ждёт в общей очереди.
+
+    kind="thread" - потоки с общим экземпляром геокодера (скоринг в rapidfuzz/scipy
+    отпускает GIL); kind="process" - процессы, каждый загружает свой экземпляр
+    (со снапшотом массивы общие через mmap).
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 0, max_pending: int = 64):
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        # статистика кэша и индексов по pid исполнителя (для /metrics)
+        self.worker_stats: Dict[int, Dict] = {}
+        if kind == "process":
+            self.pool: Executor = self.__process_pool(_warmup, ())
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="search")
+
+    def __process_pool(self, initializer, initargs: Tuple) -> ProcessPoolExecutor:
+        # spawn: в процессе сервиса уже есть потоки (пулы uvicorn/bulk), fork с ними небезопасен
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+            initargs=initargs,
+        )
+
+    def __warmup(self, pool: Executor):
+        # ошибка загрузки индекса в воркере пробрасывается
+        for future in [pool.submit(_warmup) for _ in range(self.workers)]:
+            future.result()
+
+    def warmup(self):
+        """Загрузка геокодера до первого запроса (в процессном режиме - в каждом воркере)"""
+        self.__warmup(self.pool)
+
+    def __start_reloaded_pool(self, dataset_path: str, snapshot_path: Optional[str], warm_keys: List[Tuple]) -> Executor:
+        pool = self.__process_pool(_reload, (dataset_path, snapshot_path, warm_keys))
+        try:
+            self.__warmup(pool)
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        return pool
+
+    def pending_updates(self) -> int:
+        """Изменения /admin/addresses в экземпляре процесса сервиса (в процессном режиме их нет)"""
+        return get_holder().pending_updates()
+
+    async def reload(self, dataset_path: str, snapshot_path: Optional[str], warm_queries: int = 0,
+                     discard_updates: bool = False):
+        """
+        Новый индекс без остановки: в процессном режиме поднимается новый пул, загружающий
+        индекс, и подменяет старый, старый пул завершается после запросов в работе (память
+        его процессов освобождается целиком); в потоковом - подменяется экземпляр в GeocoderHolder.
+        Кэш нового индекса прогревается последними warm_queries запросами старого.
+        Подмена выполняется в цикле событий, поэтому новые задачи не попадают в закрываемый пул.
+        Изменения /admin/addresses (только потоковый режим) без discard_updates не отбрасываются:
+        GeocoderHolder.reload отменяет перезагрузку.
+        """
+        loop = asyncio.get_running_loop()
+        if self.kind == "process":
+            keys = await loop.run_in_executor(self.pool, _cache_keys, warm_queries) if warm_queries else []
+            pool = await loop.run_in_executor(None, self.__start_reloaded_pool, dataset_path, snapshot_path, keys)
+            old, self.pool = self.pool, pool
+            self.worker_stats = {}
+            await loop.run_in_executor(None, old.shutdown)
+
+        # в процессном режиме свой экземпляр в процессе сервиса есть, только если его уже загрузили
+        holder = get_holder()
+        if self.kind == "thread" or holder.loaded:
+            keys = holder.cache_keys(warm_queries)
+            await loop.run_in_executor(None, holder.reload, dataset_path, snapshot_path, keys, discard_updates)
+
+    async def run(self, method: str, *args, **kwargs) -> Any:
+        """Результат вызова; этапы записываются в метрики и в Server-Timing текущего запроса"""
+        result, timings = await self.run_timed(method, *args, **kwargs)
+        record_stages(timings)
+        return result
+
+    async def run_timed(self, method: str, *args, **kwargs) -> Tuple[Any, Dict[str, float]]:
+        """Результат вызова и длительности его этапов (без записи в метрики)"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Сервис перегружен, повторите запрос позже",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            profile = request_profile.get() is not None
+            result, timings, pid, stats, stacks = await loop.run_in_executor(
+                self.pool, partial(_call, method, args, kwargs, time.time(), profile)
+            )
+            self.worker_stats[pid] = stats
+            if stacks is not None:
+                add_request_profile(stacks)
+            return result, timings
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
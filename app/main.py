@@ -1,92 +1,253 @@
-from fastapi import FastAPI, Depends, Query
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from typing import List, Optional
 
 
 from app.models import (
-    SearchRequest, SearchResponse, AddressObject, AddressObject2,
+    Algorithm,
+    SearchRequest, SearchResponse,
+    BatchSearchRequest, BatchSearchResponse,
     ReverseResponse,
-    CompareRequest, CompareResponse
+    CompareRequest, CompareResponse,
+    CompareBatchRequest, CompareBatchResponse,
+    ProfileListResponse,
+    ReloadStatus,
+    UpsertRequest, DeleteRequest, UpdateResponse
 )
-from app.dependencies import get_geocoder
-from geocoder.algorithm import GeocoderAlgorithm
+from app.bulk import (
+    BulkStreamingResponse, bulk_jobs, iter_request_lines, register_job, stream_bulk
+)
+from app.config import get_settings
+from app.batching import SearchCoalescer
+from app.dependencies import (
+    get_coalescer, get_executor, get_geocoder, get_profile_store, get_reloader, require_admin
+)
+from app.executor import CPUExecutor
+from app.metrics import MetricsMiddleware, register_service_gauges, registry
+from app.profiling import ProfileStore, ProfilingMiddleware
+from app.reload import Reloader
+from app.responses import address_object2, check_fast_json, compare_payload, render, search_payload
 
 app = FastAPI(
     title="Geocoder API",
     description="API для геокодирования, обратного геокодирования и оценки сходства",
     version="1.0.0",
 )
+app.add_middleware(ProfilingMiddleware, settings=get_settings, store=get_profile_store)
+app.add_middleware(MetricsMiddleware, server_timing=lambda: get_settings().server_timing)
+register_service_gauges(get_executor, get_coalescer)
 
 
 @app.on_event("startup")
 def preload_geocoder():
-  _ = get_geocoder()
+  check_fast_json()
+  if get_settings().executor == "thread":
+    _ = get_geocoder()
+  get_executor().warmup()
+  if get_settings().reload_watch:
+    get_reloader().watch()
+
+
+@app.on_event("shutdown")
+def shutdown_executor():
+  get_reloader().stop()
+  get_executor().shutdown()
 
 # 1) Топ-N адресов
 @app.post("/search", response_model=SearchResponse)
-def search_addresses(
+async def search_addresses(
     request: SearchRequest,
-    geocoder: GeocoderAlgorithm = Depends(get_geocoder)
+    coalescer: SearchCoalescer = Depends(get_coalescer)
 ):
-    results = geocoder.search(
+    # Одновременные запросы склеиваются в одну пачку search_batch (app/batching.py)
+    results = await coalescer.search(
         query=request.query,
         top_n=request.top_n,
-        weights=request.weights.dict() if request.weights else None,
-        # algorithms=request.algorithms,
+        weights=request.weights.dict(exclude_unset=True) if request.weights else None,
+        algorithms=request.algorithms,
+    )
+    return render(search_payload(request.query, results), SearchResponse)
+
+# 1.1) Пакетный поиск: все запросы скорятся одним проходом по корпусу
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def search_addresses_batch(
+    request: BatchSearchRequest,
+    executor: CPUExecutor = Depends(get_executor)
+):
+    results = await executor.run(
+        "search_batch",
+        queries=request.queries,
+        top_n=request.top_n,
+        weights=request.weights.dict(exclude_unset=True) if request.weights else None,
+        algorithms=request.algorithms,
     )
-    objects = [AddressObject(**r) for r in results]
 
-    return SearchResponse(
-        searched_address=request.query,
-        objects=objects
+    return render(
+        {"results": [search_payload(query, objects) for query, objects in zip(request.queries, results)]},
+        BatchSearchResponse,
     )
 
+# 1.2) Потоковое геокодирование файла: CSV / NDJSON на входе, NDJSON на выходе
+@app.post("/search/bulk")
+async def search_addresses_bulk(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    top_n: int = Query(1, ge=1),
+    dl: Optional[float] = Query(None),
+    bm25: Optional[float] = Query(None),
+    exact: Optional[float] = Query(None),
+    jaro_winkler: Optional[float] = Query(None),
+    jaccard: Optional[float] = Query(None),
+    algorithms: Optional[List[Algorithm]] = Query(None),
+    executor: CPUExecutor = Depends(get_executor),
+):
+    # веса - как у /search/batch: заданные явно поверх весов по умолчанию
+    weights = {
+        name: weight
+        for name, weight in {
+            "dl": dl, "bm25": bm25, "exact": exact, "jaro_winkler": jaro_winkler, "jaccard": jaccard,
+        }.items()
+        if weight is not None
+    }
+    job_id = register_job()
+    stream = stream_bulk(
+        iter_request_lines(request),
+        executor,
+        fmt=format,
+        top_n=top_n,
+        weights=weights or None,
+        algorithms=algorithms,
+        progress=bulk_jobs[job_id],
+    )
+    return BulkStreamingResponse(
+        stream,
+        media_type="application/x-ndjson",
+        headers={"X-Bulk-Job-Id": job_id},
+    )
+
+
+@app.get("/search/bulk/{job_id}")
+def search_addresses_bulk_progress(job_id: str):
+    progress = bulk_jobs.get(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    return {"job_id": job_id, **progress.as_dict()}
+
 # 2) Обратное геокодирование
 @app.get("/reverse", response_model=ReverseResponse)
-def reverse_geocode(
+async def reverse_geocode(
     lat: float = Query(...),
     lon: float = Query(...),
-    geocoder: GeocoderAlgorithm = Depends(get_geocoder),
+    limit: int = Query(1, ge=1, le=100),
+    radius_m: Optional[float] = Query(None, ge=0),
+    executor: CPUExecutor = Depends(get_executor),
 ):
-    results = geocoder.reverse(lat=lat, lon=lon)
-    objects = [AddressObject2(**r) for r in results] if results else []
-
-    return ReverseResponse(
-        query_point_lat=lat,
-        query_point_lon=lon,
-        objects=objects
+    # radius_m=0 (пустое поле радиуса в веб-интерфейсе) - без ограничения по радиусу
+    results = await executor.run("reverse", lat=lat, lon=lon, limit=limit, radius_m=radius_m or None)
+    return render(
+        {
+            "query_point_lat": lat,
+            "query_point_lon": lon,
+            "objects": [address_object2(r) for r in results],
+        },
+        ReverseResponse,
     )
 
 
-# 3) Сравнение двух адресов
+# 3) Сравнение двух адресов: оба адреса разрешаются одним пакетным поиском
 @app.post("/compare", response_model=CompareResponse)
-def compare_addresses(
+async def compare_addresses(
     request: CompareRequest,
-    geocoder: GeocoderAlgorithm = Depends(get_geocoder)
+    executor: CPUExecutor = Depends(get_executor)
 ):
-    c1 = geocoder.get_best_candidate(request.address_1, request.weights, request.algorithms)
-    c2 = geocoder.get_best_candidate(request.address_2, request.weights, request.algorithms)
-
-    if not c1 or not c2:
-        return CompareResponse(
-            address_1=request.address_1,
-            address_2=request.address_2,
-            distance_m=None,
-            similarity=None,
-            point_1=AddressObject(**c1) if c1 else None,
-            point_2=AddressObject(**c2) if c2 else None,
-        )
-
-    d = geocoder.haversine_distance_m(c1["lat"], c1["lon"], c2["lat"], c2["lon"])
-    similarity = max(0.0, 1.0 - d / 1000.0)
-
-    return CompareResponse(
+    result = await executor.run(
+        "compare",
         address_1=request.address_1,
         address_2=request.address_2,
-        distance_m=d,
-        similarity=similarity,
-        point_1=AddressObject(**c1),
-        point_2=AddressObject(**c2),
+        weights=request.weights.dict(exclude_unset=True) if request.weights else None,
+        algorithms=request.algorithms,
     )
+    return render(compare_payload(result), CompareResponse)
+
+# 3.1) Сравнение списка пар адресов
+@app.post("/compare/batch", response_model=CompareBatchResponse)
+async def compare_addresses_batch(
+    request: CompareBatchRequest,
+    executor: CPUExecutor = Depends(get_executor)
+):
+    results = await executor.run(
+        "compare_batch",
+        pairs=[(pair.address_1, pair.address_2) for pair in request.pairs],
+        weights=request.weights.dict(exclude_unset=True) if request.weights else None,
+        algorithms=request.algorithms,
+    )
+    return render({"results": [compare_payload(r) for r in results]}, CompareBatchResponse)
+
+# Метрики в текстовом формате Prometheus
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Перезагрузка индекса из настроенного источника без остановки: сборка в фоне и атомарная замена
+@app.post("/admin/reload", response_model=ReloadStatus, status_code=202, dependencies=[Depends(require_admin)])
+async def reload_index(
+    wait: bool = Query(False),
+    discard_updates: bool = Query(False),
+    reloader: Reloader = Depends(get_reloader),
+):
+    task = reloader.start(discard_updates=discard_updates)
+    if wait:
+        await task
+    return reloader.status()
+
+
+@app.get("/admin/reload", response_model=ReloadStatus, dependencies=[Depends(require_admin)])
+def reload_status(reloader: Reloader = Depends(get_reloader)):
+    return reloader.status()
+
+
+# Профили запросов (GEOCODER_PROFILE_SAMPLE_RATE / заголовок X-Geocoder-Profile)
+@app.get("/admin/profiles", response_model=ProfileListResponse, dependencies=[Depends(require_admin)])
+def list_profiles(store: ProfileStore = Depends(get_profile_store)):
+    return {"profiles": store.list()}
+
+
+# Свёрнутые стеки для flamegraph.pl / speedscope, вес - микросекунды
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str, store: ProfileStore = Depends(get_profile_store)):
+    text = store.collapsed(profile_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return PlainTextResponse(text)
+
+
+def _require_thread_executor():
+    # у каждого процесса пула свой индекс: изменение попало бы только в один из них
+    if get_settings().executor != "thread":
+        raise HTTPException(
+            status_code=409,
+            detail="Инкрементальные обновления доступны только с GEOCODER_EXECUTOR=thread, используйте /admin/reload",
+        )
+
+
+# Добавление и замена адресов по id без пересборки индекса
+@app.post("/admin/addresses", response_model=UpdateResponse, dependencies=[Depends(require_admin)])
+async def upsert_addresses(request: UpsertRequest, executor: CPUExecutor = Depends(get_executor)):
+    _require_thread_executor()
+    return await executor.run("upsert", [record.model_dump() for record in request.records])
+
+
+@app.post("/admin/addresses/delete", response_model=UpdateResponse, dependencies=[Depends(require_admin)])
+async def delete_addresses(request: DeleteRequest, executor: CPUExecutor = Depends(get_executor)):
+    _require_thread_executor()
+    return await executor.run("delete", request.ids)
+
+
+# Уплотнение: пересборка индексов по живым строкам (иначе выполняется в фоне по порогу)
+@app.post("/admin/compact", response_model=UpdateResponse, dependencies=[Depends(require_admin)])
+async def compact_index(executor: CPUExecutor = Depends(get_executor)):
+    _require_thread_executor()
+    return await executor.run("compact")
 
 @app.get("/", response_class=HTMLResponse)
 def index_page():
@@ -764,7 +925,7 @@ def index_page():
       const params = new URLSearchParams({
         lat: lat,
         lon: lon,
-        top_n: String(topN),
+        limit: String(topN),
         radius_m: String(radius),
       });
 
@@ -0,0 +1,227 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Длительности этапов текущего запроса (для Server-Timing); словарь создаёт MetricsMiddleware
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values: Dict[Labels, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels: str):
+        key = _labels(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            lines.extend(f"{self.name}{_format_labels(key)} {value}" for key, value in self.values.items())
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # по меткам: счётчики корзин (последняя - +Inf), сумма
+        self.values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = _labels(labels)
+        with self.lock:
+            counts, total = self.values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total) in self.values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauges:
+    """Значения, снимаемые в момент запроса /metrics: функция возвращает (метки, значение)"""
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+                 kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{_format_labels(_labels(labels))} {value}" for labels, value in self.collect())
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+requests_total = registry.register(Counter(
+    "geocoder_requests_total", "HTTP-запросы по эндпоинту и коду ответа"))
+request_duration = registry.register(Histogram(
+    "geocoder_request_duration_seconds", "Время обработки HTTP-запроса"))
+stage_duration = registry.register(Histogram(
+    "geocoder_stage_duration_seconds", "Время этапов поиска (нормализация, алгоритмы, объединение, ответ)"))
+
+
+def observe_stages(timings: Dict[str, float]):
+    for stage, seconds in timings.items():
+        stage_duration.observe(seconds, stage=stage)
+
+
+def record_stages(timings: Dict[str, float]):
+    """Этапы одного вызова геокодера: в гистограммы и в Server-Timing текущего запроса"""
+    observe_stages(timings)
+    add_request_timings(timings)
+
+
+def add_request_timings(timings: Dict[str, float]):
+    current = request_timings.get()
+    if current is not None:
+        for stage, seconds in timings.items():
+            current[stage] = current.get(stage, 0.0) + seconds
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in timings.items())
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: длительность и коды ответов по шаблону пути эндпоинта,
+    при server_timing - заголовок Server-Timing с этапами запроса.
+    """
+
+    def __init__(self, app, server_timing: Callable[[], bool] = lambda: False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = request_timings.set(timings)
+        status = [500]
+        start = time.perf_counter()
+        enabled = self.server_timing()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if enabled:
+                    timings["total"] = time.perf_counter() - start
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing_header(timings).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_timings.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "other")
+            request_duration.observe(time.perf_counter() - start, endpoint=endpoint)
+            requests_total.inc(endpoint=endpoint, status=str(status[0]))
+
+
+def register_service_gauges(get_executor: Callable, get_coalescer: Callable):
+    """Метрики, снимаемые при запросе /metrics: очередь пула, склейка запросов, кэш и индексы"""
+
+    def cache_totals(field: str):
+        def collect():
+            stats = get_executor().worker_stats.values()
+            return [({}, sum(s["cache"][field] for s in stats))]
+        return collect
+
+    def cache_hit_rate():
+        stats = list(get_executor().worker_stats.values())
+        hits = sum(s["cache"]["hits"] for s in stats)
+        total = hits + sum(s["cache"]["misses"] for s in stats)
+        return [({}, hits / total if total else 0.0)]
+
+    def index_size():
+        # индексы у всех исполнителей одинаковые, берётся любой
+        for stats in get_executor().worker_stats.values():
+            return [({"index": name}, value) for name, value in stats["index"].items()]
+        return []
+
+    registry.register(Gauges(
+        "geocoder_executor_pending", "Запросы в очереди и в работе пула поиска",
+        lambda: [({}, get_executor().pending)]))
+    registry.register(Gauges(
+        "geocoder_executor_rejected_total", "Запросы, отклонённые с 503 из-за переполнения очереди",
+        lambda: [({}, get_executor().rejected)], kind="counter"))
+    registry.register(Gauges(
+        "geocoder_batches_total", "Пачки склеенных запросов /search",
+        lambda: [({}, get_coalescer().batches)], kind="counter"))
+    registry.register(Gauges(
+        "geocoder_batched_queries_total", "Запросы /search, прошедшие через склейку",
+        lambda: [({}, get_coalescer().queries)], kind="counter"))
+    registry.register(Gauges(
+        "geocoder_cache_hits_total", "Попадания в кэш результатов (сумма по исполнителям)",
+        cache_totals("hits"), kind="counter"))
+    registry.register(Gauges(
+        "geocoder_cache_misses_total", "Промахи кэша результатов (сумма по исполнителям)",
+        cache_totals("misses"), kind="counter"))
+    registry.register(Gauges(
+        "geocoder_cache_evictions_total", "Вытеснения из кэша результатов",
+        cache_totals("evictions"), kind="counter"))
+    registry.register(Gauges(
+        "geocoder_cache_size", "Записей в кэше результатов", cache_totals("size")))
+    registry.register(Gauges(
+        "geocoder_cache_hit_ratio", "Доля попаданий в кэш результатов", cache_hit_rate))
+    registry.register(Gauges(
+        "geocoder_index_size", "Размеры индексов: строки, термы и постинги BM25, точки, улицы", index_size))
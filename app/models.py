@@ -1,10 +1,16 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+
+# Имена алгоритмов (geocoder/scorers.py, DEFAULT_WEIGHTS)
+Algorithm = Literal["dl", "bm25", "exact", "jaro_winkler", "jaccard"]
 
 
 class Weights(BaseModel):
     dl: float = 1.0
     bm25: float = 1.0 
+    exact: float = 1.0
+    jaro_winkler: float = 0.0
+    jaccard: float = 0.0
 
 
 class AddressObject(BaseModel):
@@ -19,15 +25,19 @@ class AddressObject(BaseModel):
 
 class AddressObject2(BaseModel):
     address: str
+    locality: str = ""
+    street: str = ""
+    number: str = ""
     lon: float
     lat: float
+    distance_m: Optional[float] = None
 
 
 class SearchRequest(BaseModel):
     query: str
-    top_n: int = 5
+    top_n: int = Field(5, ge=1, le=100)
     weights: Optional[Weights] = None
-    algorithms: Optional[List[str]] = None
+    algorithms: Optional[List[Algorithm]] = None
 
 
 class SearchResponse(BaseModel):
@@ -35,6 +45,17 @@ class SearchResponse(BaseModel):
     objects: List[AddressObject]
 
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_n: int = Field(5, ge=1, le=100)
+    weights: Optional[Weights] = None
+    algorithms: Optional[List[Algorithm]] = None
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse]
+
+
 class ReverseResponse(BaseModel):
     query_point_lat: float
     query_point_lon: float
@@ -45,7 +66,7 @@ class CompareRequest(BaseModel):
     address_1: str
     address_2: str
     weights: Optional[Weights] = None
-    algorithms: Optional[List[str]] = None
+    algorithms: Optional[List[Algorithm]] = None
 
 
 class CompareResponse(BaseModel):
@@ -55,3 +76,67 @@ class CompareResponse(BaseModel):
     similarity: Optional[float]
     point_1: Optional[AddressObject]
     point_2: Optional[AddressObject]
+
+
+class ComparePair(BaseModel):
+    address_1: str
+    address_2: str
+
+
+class CompareBatchRequest(BaseModel):
+    pairs: List[ComparePair]
+    weights: Optional[Weights] = None
+    algorithms: Optional[List[Algorithm]] = None
+
+
+class CompareBatchResponse(BaseModel):
+    results: List[CompareResponse]
+
+
+class ProfileInfo(BaseModel):
+    id: str
+    created_at: float
+    endpoint: str
+    status: int
+    trigger: Literal["header", "sample"]
+    duration_ms: float
+    profiled_ms: float
+
+
+class ProfileListResponse(BaseModel):
+    profiles: List[ProfileInfo]
+
+
+class ReloadStatus(BaseModel):
+    state: Literal["idle", "running", "done", "failed"]
+    generation: int
+    dataset_path: str
+    snapshot_path: Optional[str]
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    duration_s: Optional[float]
+    error: Optional[str]
+
+
+class AddressUpdate(BaseModel):
+    id: int
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    name: str = ""
+    address: str
+
+
+class UpsertRequest(BaseModel):
+    records: List[AddressUpdate]
+
+
+class DeleteRequest(BaseModel):
+    ids: List[int]
+
+
+class UpdateResponse(BaseModel):
+    added: Optional[int] = None
+    replaced: Optional[int] = None
+    deleted: Optional[int] = None
+    compacting: bool
+    index: Dict[str, int]
@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from geocoder.profiling import Stacks, collapsed, merge_stacks
+
+PROFILE_HEADER = "x-geocoder-profile"
+PROFILE_ID_HEADER = "x-geocoder-profile-id"
+
+# Стеки вызовов пула для текущего запроса; None - запрос не профилируется
+request_profile: ContextVar[Optional[Stacks]] = ContextVar("request_profile", default=None)
+
+
+class ProfileStore:
+    """Последние профили запросов в памяти процесса сервиса"""
+
+    def __init__(self, keep: int = 50):
+        self.keep = keep
+        self.profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, profile_id: str, info: Dict[str, Any], stacks: Stacks):
+        with self.lock:
+            self.profiles[profile_id] = {"info": {"id": profile_id, **info}, "stacks": stacks}
+            while len(self.profiles) > self.keep:
+                self.profiles.popitem(last=False)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [profile["info"] for profile in reversed(self.profiles.values())]
+
+    def collapsed(self, profile_id: str) -> Optional[str]:
+        with self.lock:
+            profile = self.profiles.get(profile_id)
+        return collapsed(profile["stacks"]) if profile is not None else None
+
+
+def add_request_profile(stacks: Stacks):
+    current = request_profile.get()
+    if current is not None:
+        merge_stacks(current, stacks)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware профилирования запросов: запрос с заголовком X-Geocoder-Profile
+    (если разрешено) или случайная доля sample_rate запросов выполняется в пуле под
+    профилировщиком, стеки сохраняются в ProfileStore, id профиля - в заголовке ответа
+    X-Geocoder-Profile-Id. Когда профилирование выключено, запрос проходит без изменений.
+    """
+
+    def __init__(self, app, settings: Callable[[], Any], store: Callable[[], ProfileStore]):
+        self.app = app
+        self.settings = settings
+        self.store = store
+
+    def __trigger(self, scope) -> Optional[str]:
+        settings = self.settings()
+        if settings.profile_header and any(name == PROFILE_HEADER.encode() for name, _ in scope["headers"]):
+            return "header"
+        if settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self.__trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        stacks: Stacks = {}
+        token = request_profile.set(stacks)
+        status = [500]
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER.encode(), profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_profile.reset(token)
+            # случайно выбранные запросы без работы в пуле (/metrics, /docs) не сохраняются
+            if stacks or trigger == "header":
+                route = scope.get("route")
+                self.store().add(
+                    profile_id,
+                    {
+                        "created_at": time.time(),
+                        "endpoint": getattr(route, "path", scope["path"]),
+                        "status": status[0],
+                        "trigger": trigger,
+                        "duration_ms": (time.perf_counter() - start) * 1000,
+                        "profiled_ms": sum(stacks.values()) * 1000,
+                    },
+                    stacks,
+                )
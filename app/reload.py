@@ -0,0 +1,192 @@
+import asyncio
+import gc
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from geocoder.algorithm import GeocoderAlgorithm
+from geocoder.snapshot import META_FILE
+
+logger = logging.getLogger(__name__)
+
+PENDING_UPDATES_DETAIL = (
+    "В индексе есть изменения /admin/addresses, которых нет в источнике; перезагрузка их потеряет. "
+    "Перенесите их в источник и повторите с discard_updates=true"
+)
+
+
+class PendingUpdatesError(Exception):
+    """Перезагрузка отменена: в текущем индексе есть изменения, которых нет в источнике"""
+
+
+class GeocoderHolder:
+    """
+    Текущий экземпляр GeocoderAlgorithm процесса. Новый индекс строится рядом со старым,
+    затем ссылка подменяется одним присваиванием: запросы, уже получившие старый экземпляр,
+    дорабатывают на нём, а его память освобождается, когда ссылок не остаётся.
+    """
+
+    def __init__(self, dataset_path: str, snapshot_path: Optional[str] = None):
+        self.dataset_path = dataset_path
+        self.snapshot_path = snapshot_path
+        self.__geocoder: Optional[GeocoderAlgorithm] = None
+        self.__lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.__geocoder is not None
+
+    def get(self) -> GeocoderAlgorithm:
+        geocoder = self.__geocoder
+        if geocoder is None:
+            with self.__lock:
+                if self.__geocoder is None:
+                    self.__geocoder = GeocoderAlgorithm(
+                        dataset_path=self.dataset_path, snapshot_path=self.snapshot_path
+                    )
+                geocoder = self.__geocoder
+        return geocoder
+
+    def cache_keys(self, limit: int) -> List[Tuple]:
+        geocoder = self.__geocoder
+        return geocoder.model.cache_keys(limit) if geocoder is not None else []
+
+    def pending_updates(self) -> int:
+        geocoder = self.__geocoder
+        return geocoder.pending_updates if geocoder is not None else 0
+
+    def reload(self, dataset_path: str, snapshot_path: Optional[str], warm_keys: List[Tuple] = (),
+               discard_updates: bool = False):
+        """
+        Сборка нового экземпляра, прогрев его кэша запросами warm_keys и замена.
+        Без discard_updates отменяется, если в текущем экземпляре есть изменения upsert / delete
+        (в том числе пришедшие во время сборки).
+        """
+        pending = self.pending_updates()
+        if pending and not discard_updates:
+            raise PendingUpdatesError(PENDING_UPDATES_DETAIL)
+        geocoder = GeocoderAlgorithm(dataset_path=dataset_path, snapshot_path=snapshot_path)
+        geocoder.model.warm_cache(warm_keys)
+        with self.__lock:
+            if self.pending_updates() != pending and not discard_updates:
+                raise PendingUpdatesError(PENDING_UPDATES_DETAIL)
+            self.__geocoder = geocoder
+            self.dataset_path = dataset_path
+            self.snapshot_path = snapshot_path
+        # индексы старого экземпляра связаны циклическими ссылками (модель <-> скореры)
+        gc.collect()
+
+
+def source_signature(dataset_path: str, snapshot_path: Optional[str]) -> Optional[Tuple]:
+    """Отпечаток источника индекса: meta.json снапшота (пишется последним) или CSV"""
+    path = os.path.join(snapshot_path, META_FILE) if snapshot_path else dataset_path
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class Reloader:
+    """
+    Перезагрузка индекса без остановки сервиса: по POST /admin/reload или, при
+    watch, по изменению источника (опрос раз в poll_s секунд). Источник - только
+    настроенные dataset_path / snapshot_path. Одновременно выполняется не больше
+    одной перезагрузки; при ошибке остаётся старый индекс, подробности - в логе.
+    """
+
+    def __init__(self, executor, dataset_path: str, snapshot_path: Optional[str] = None,
+                 warm_queries: int = 0, poll_s: float = 30.0):
+        self.executor = executor
+        self.dataset_path = dataset_path
+        self.snapshot_path = snapshot_path
+        self.warm_queries = warm_queries
+        self.poll_s = poll_s
+        self.state = "idle"
+        self.generation = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        # отпечаток источника последней перезагрузки (успешной или нет - повторять её для того же файла незачем)
+        self.signature = source_signature(dataset_path, snapshot_path)
+        self.task: Optional[asyncio.Task] = None
+        self.watcher: Optional[asyncio.Task] = None
+
+    def status(self) -> Dict[str, Any]:
+        duration = None
+        if self.started_at is not None and self.finished_at is not None:
+            duration = self.finished_at - self.started_at
+        return {
+            "state": self.state,
+            "generation": self.generation,
+            "dataset_path": self.dataset_path,
+            "snapshot_path": self.snapshot_path,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_s": duration,
+            "error": self.error,
+        }
+
+    def start(self, discard_updates: bool = False) -> asyncio.Task:
+        """
+        Запуск перезагрузки в фоне; 409, если она уже идёт или если в индексе есть
+        изменения /admin/addresses, а discard_updates не задан.
+        """
+        if self.task is not None and not self.task.done():
+            raise HTTPException(status_code=409, detail="Перезагрузка индекса уже выполняется")
+        if not discard_updates and self.executor.pending_updates():
+            raise HTTPException(status_code=409, detail=PENDING_UPDATES_DETAIL)
+        self.state = "running"
+        self.started_at = time.time()
+        self.finished_at = None
+        self.error = None
+        self.task = asyncio.ensure_future(self.__reload(discard_updates))
+        return self.task
+
+    async def __reload(self, discard_updates: bool):
+        signature = source_signature(self.dataset_path, self.snapshot_path)
+        try:
+            await self.executor.reload(self.dataset_path, self.snapshot_path, self.warm_queries, discard_updates)
+        except PendingUpdatesError as exc:
+            self.state = "failed"
+            self.error = str(exc)
+        except Exception:
+            # текст исключения (пути, содержимое файлов) остаётся в логе сервиса
+            logger.exception("Не удалось перезагрузить индекс")
+            self.state = "failed"
+            self.error = "Не удалось загрузить индекс, подробности в логе сервиса"
+        else:
+            self.state = "done"
+            self.generation += 1
+        finally:
+            self.signature = signature
+            self.finished_at = time.time()
+
+    def watch(self):
+        self.watcher = asyncio.ensure_future(self.__watch())
+
+    async def __watch(self):
+        # перезагрузка, когда отпечаток источника изменился и не меняется между двумя опросами
+        # (CSV дописан до конца)
+        previous = self.signature
+        while True:
+            await asyncio.sleep(self.poll_s)
+            current = source_signature(self.dataset_path, self.snapshot_path)
+            if current is not None and current != self.signature and current == previous:
+                if self.task is None or self.task.done():
+                    try:
+                        await self.start()
+                    except HTTPException as exc:
+                        # изменения /admin/addresses не теряются молча: источник пропускается до ручной перезагрузки
+                        self.state = "failed"
+                        self.error = exc.detail
+                        self.signature = current
+            previous = current
+
+    def stop(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
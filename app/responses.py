@@ -0,0 +1,71 @@
+from typing import Any, Dict, List, Optional, Type
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel
+
+from app.config import get_settings
+from app.metrics import record_stages
+from geocoder.timing import collect_stages, stage
+
+
+def address_object(r: Dict[str, Any]) -> Dict[str, Any]:
+    """Объект результата поиска в порядке полей AddressObject"""
+    return {
+        "locality": r["locality"],
+        "street": r["street"],
+        "number": r["number"],
+        "lon": r["lon"],
+        "lat": r["lat"],
+        "score": r.get("score"),
+        "distance_m": r.get("distance_m"),
+    }
+
+
+def address_object2(r: Dict[str, Any]) -> Dict[str, Any]:
+    """Объект обратного геокодирования в порядке полей AddressObject2"""
+    return {
+        "address": r["address"],
+        "locality": r["locality"],
+        "street": r["street"],
+        "number": r["number"],
+        "lon": r["lon"],
+        "lat": r["lat"],
+        "distance_m": r.get("distance_m"),
+    }
+
+
+def search_payload(query: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"searched_address": query, "objects": [address_object(r) for r in results]}
+
+
+def compare_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **result,
+        "point_1": address_object(result["point_1"]) if result["point_1"] else None,
+        "point_2": address_object(result["point_2"]) if result["point_2"] else None,
+    }
+
+
+def render(payload: Dict[str, Any], model: Type[BaseModel]) -> Any:
+    """
+    Ответ из готовой структуры. По умолчанию - через pydantic-модель ответа (валидация
+    и стандартный JSON). С GEOCODER_FAST_JSON структура, уже собранная в форме схемы,
+    сериализуется orjson напрямую, без построения моделей. Тело ответа собирается
+    внутри этапа response на обоих путях, чтобы их замеры были сравнимы.
+    """
+    with collect_stages() as timings, stage("response"):
+        if get_settings().fast_json:
+            response = ORJSONResponse(payload)
+        else:
+            response = JSONResponse(model.model_validate(payload).model_dump(mode="json"))
+    record_stages(timings)
+    return response
+
+
+def check_fast_json(enabled: Optional[bool] = None):
+    """Ошибка при старте, а не на первом запросе, если включён быстрый JSON без orjson"""
+    if enabled if enabled is not None else get_settings().fast_json:
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            raise RuntimeError("GEOCODER_FAST_JSON требует пакет orjson (pip install orjson)")
@@ -0,0 +1,60 @@
+"""
+Сравнение BM25Index с rank_bm25.BM25Okapi на синтетическом датасете:
+совпадение скоров и время get_scores на запрос.
+
+    python -m benchmarks.bm25 --size 50000 --queries 50
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from benchmarks.synthetic import write_dataset
+from geocoder.bm25 import BM25Index
+from geocoder.model import SearchAddressModel
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = SearchAddressModel(write_dataset(os.path.join(tmp, 'dataset.csv'), args.size))
+
+    tokenize = model._SearchAddressModel__tokenize_address
+    normalized = model.normalized_dataset.to_list()
+    corpus = [tokenize(addr) for addr in normalized]
+    queries = [tokenize(addr) for addr in random.Random(0).sample(normalized, args.queries)]
+
+    start = time.perf_counter()
+    okapi = BM25Okapi(corpus)
+    print(f'BM25Okapi build: {time.perf_counter() - start:.2f}s')
+    start = time.perf_counter()
+    index = BM25Index(corpus)
+    print(f'BM25Index build: {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    expected = [okapi.get_scores(q) for q in queries]
+    okapi_time = (time.perf_counter() - start) / len(queries)
+
+    start = time.perf_counter()
+    actual = [index.get_scores(q) for q in queries]
+    index_time = (time.perf_counter() - start) / len(queries)
+
+    max_err = max(float(np.max(np.abs(e - a))) for e, a in zip(expected, actual))
+    print(f'max abs score diff: {max_err:.2e}')
+    assert all(np.allclose(e, a) for e, a in zip(expected, actual)), 'scores differ'
+
+    print(f'BM25Okapi.get_scores: {okapi_time * 1000:.2f} ms/query')
+    print(f'BM25Index.get_scores: {index_time * 1000:.2f} ms/query')
+    print(f'speedup: {okapi_time / index_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Память под данные модели: прежнее представление (pandas DataFrame + список списков
+строковых n-грамм) против AddressStore + StringColumn + TokenColumn.
+BM25-индекс у обоих представлений один и тот же (из TokenColumn), поэтому он
+измеряется отдельно и печатается рядом со сравнением; KD-дерево не измеряется.
+
+    python -m benchmarks.memory --size 200000
+"""
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.synthetic import write_dataset
+from geocoder.bm25 import BM25Index
+from geocoder.columns import StringColumn
+from geocoder.model import SearchAddressModel
+from geocoder.store import AddressStore, TokenColumn
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_dataset(os.path.join(tmp, 'dataset.csv'), args.size)
+        model = SearchAddressModel(path)
+        normalize = model._SearchAddressModel__preprocess_address
+        tokenize = model._SearchAddressModel__tokenize_address
+
+        def legacy():
+            dataset = pd.read_csv(path)
+            dataset.iloc[:, 5] = dataset.iloc[:, 5].fillna('')
+            # как раньше: отдельный объект str на каждую n-грамму каждого адреса
+            tokenized = [tokenize(normalize(str(address))) for address in dataset.iloc[:, 5]]
+            return dataset, tokenized
+
+        def compact():
+            store = AddressStore.from_csv(path)
+            normalized = [normalize(address) for address in store.addresses()]
+            trigrams, vocabulary = TokenColumn.encode(normalized, tokenize)
+            return store, StringColumn.from_list(normalized), trigrams, vocabulary
+
+        _, legacy_size = measure(legacy)
+        (_, _, trigrams, vocabulary), compact_size = measure(compact)
+        _, bm25_size = measure(lambda: BM25Index.from_token_ids(vocabulary, trigrams.ids, trigrams.offsets))
+
+    print(f'rows: {args.size}')
+    print(f'DataFrame + tokenized_dataset: {legacy_size / 2 ** 20:.1f} MiB')
+    print(f'AddressStore + TokenColumn:    {compact_size / 2 ** 20:.1f} MiB')
+    print(f'reduction: {legacy_size / compact_size:.1f}x (BM25 index excluded)')
+    print(f'BM25 index (same for both):    {bm25_size / 2 ** 20:.1f} MiB')
+    print(f'reduction with BM25: {(legacy_size + bm25_size) / (compact_size + bm25_size):.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Качество двухэтапного поиска (BM25-кандидаты + DL только по ним) относительно
+DL по всему корпусу на размеченных запросах: для каждой строки синтетического
+датасета генерируется запрос (полный, сокращённый, с опечаткой), метка - адрес строки.
+
+    python -m benchmarks.quality --size 50000 --queries 300
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic import QUERY_KINDS, make_query, write_dataset
+from geocoder.model import SearchAddressModel
+
+
+def evaluate(model: SearchAddressModel, labelled, top_n: int):
+    hits_1 = hits_n = 0
+    rankings = []
+    start = time.perf_counter()
+    for query, label in labelled:
+        addresses = model.search(query, top_n=top_n)['address'].tolist() if top_n else []
+        rankings.append(addresses)
+        hits_1 += bool(addresses) and addresses[0] == label
+        hits_n += label in addresses
+    elapsed = (time.perf_counter() - start) / len(labelled)
+    return hits_1 / len(labelled), hits_n / len(labelled), elapsed, rankings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--candidates', type=int, default=None, help="по умолчанию SEARCH_CANDIDATES")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = SearchAddressModel(write_dataset(os.path.join(tmp, 'dataset.csv'), args.size))
+    # сравниваются ранжирования, поэтому быстрый путь по структурному индексу выключен
+    # в обоих прогонах: иначе полные запросы не доходят ни до полного прохода, ни до BM25
+    model.exact_match = False
+
+    rnd = random.Random(7)
+    rows = rnd.sample(range(len(model.dataset)), args.queries)
+    labelled = [
+        (make_query(model.dataset.address[row], QUERY_KINDS[i % len(QUERY_KINDS)], rnd), model.dataset.address[row])
+        for i, row in enumerate(rows)
+    ]
+
+    two_stage = model.candidates if args.candidates is None else args.candidates
+    results = {}
+    for name, candidates in (('full scan', 0), (f'two-stage ({two_stage})', two_stage)):
+        model.candidates = candidates
+        model.invalidate_cache()
+        results[name] = evaluate(model, labelled, args.top_n)
+        hit_1, hit_n, elapsed, _ = results[name]
+        print(f'{name:>20}: hit@1 {hit_1:.3f}  hit@{args.top_n} {hit_n:.3f}  {elapsed * 1000:.1f} ms/query')
+
+    (_, _, _, full), (_, _, _, staged) = results.values()
+    same_top_1 = sum(bool(a) and bool(b) and a[0] == b[0] for a, b in zip(full, staged)) / len(full)
+    overlap = sum(len(set(a) & set(b)) / max(1, len(set(a))) for a, b in zip(full, staged)) / len(full)
+    print(f'top-1 agreement with full scan: {same_top_1:.3f}, top-{args.top_n} overlap: {overlap:.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+Воспроизводимый бенчмарк поиска, обратного геокодирования и сравнения адресов.
+
+Для каждого размера генерируется синтетический московский датасет (seed фиксирован),
+строится индекс и прогоняется смесь запросов: полные, сокращённые, с опечатками
+(доли задаются --mix) и точки для обратного геокодирования. Печатаются время
+построения, RSS процесса, пропускная способность и p50/p95/p99 для
+SearchAddressModel.search, address_by_coords, GeocoderAlgorithm.compare и, по
+флагам, HTTP-эндпоинтов /search, /reverse, /compare. Кэш результатов сбрасывается
+перед каждым замером.
+
+    python -m benchmarks.suite --sizes 10000 100000 --queries 1000
+    python -m benchmarks.suite --sizes 100000 --http --json results.json
+    python -m benchmarks.suite --sizes 100000 --url http://localhost:8000 --concurrency 8
+
+--http поднимает приложение в процессе (TestClient, индекс из снапшота),
+--url нагружает уже запущенный сервис (датасет сервиса должен быть того же размера).
+Сгенерированные датасеты кэшируются в --data-dir.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from benchmarks.synthetic import LAT_RANGE, LON_RANGE, QUERY_KINDS, make_query, write_dataset
+from geocoder.algorithm import GeocoderAlgorithm
+
+DEFAULT_MIX = 'clean=0.4,abbreviated=0.3,typo=0.3'
+
+
+def rss_mb() -> float:
+    """Текущий RSS процесса (Linux), иначе пиковый"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(','):
+        kind, _, share = part.partition('=')
+        if kind not in QUERY_KINDS:
+            raise SystemExit(f'неизвестный вид запроса {kind!r}, допустимы: {", ".join(QUERY_KINDS)}')
+        weights[kind] = float(share)
+    return weights
+
+
+def dataset_path(data_dir: str, size: int, seed: int) -> str:
+    path = os.path.join(data_dir, f'synthetic_{size}_{seed}.csv')
+    if not os.path.exists(path):
+        write_dataset(path + '.tmp', size, seed)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def make_workload(addresses: Sequence[str], queries: int, points: int, mix: Dict[str, float], seed: int):
+    """Текстовые запросы (вид, запрос), точки (lat, lon) и пары адресов для сравнения"""
+    rnd = random.Random(seed)
+    kinds = rnd.choices(list(mix), weights=list(mix.values()), k=queries)
+    texts = [(kind, make_query(addresses[rnd.randrange(len(addresses))], kind, rnd)) for kind in kinds]
+    coords = [(rnd.uniform(*LAT_RANGE), rnd.uniform(*LON_RANGE)) for _ in range(points)]
+    pairs = [(texts[i][1], texts[(i + 1) % len(texts)][1]) for i in range(0, len(texts), 2)]
+    return texts, coords, pairs
+
+
+def stats(latencies: List[float], wall: float) -> Dict[str, float]:
+    values = np.asarray(latencies) * 1000
+    return {
+        'n': len(values),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'qps': len(values) / wall if wall else 0.0,
+    }
+
+
+def measure(call: Callable[[Any], Any], items: Sequence[Any], concurrency: int = 1) -> Dict[str, float]:
+    def timed(item) -> float:
+        start = time.perf_counter()
+        call(item)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, items))
+    else:
+        latencies = [timed(item) for item in items]
+    return stats(latencies, time.perf_counter() - start)
+
+
+@contextmanager
+def app_client(snapshot_path: str) -> Iterator[Any]:
+    """Приложение в процессе (TestClient) с индексом из снапшота"""
+    from fastapi.testclient import TestClient
+    from app import dependencies
+    from app.config import get_settings
+    from app.main import app
+
+    os.environ['GEOCODER_SNAPSHOT_PATH'] = snapshot_path
+    caches = (
+        get_settings, dependencies.get_holder, dependencies.get_executor,
+        dependencies.get_coalescer, dependencies.get_reloader,
+    )
+    for cached in caches:
+        cached.cache_clear()
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        for cached in caches:
+            cached.cache_clear()
+        os.environ.pop('GEOCODER_SNAPSHOT_PATH', None)
+
+
+def check(response):
+    response.raise_for_status()
+    return response
+
+
+def bench_http(client, texts, coords, pairs, concurrency: int, top_n: int) -> Dict[str, Dict[str, float]]:
+    return {
+        'http /search': measure(
+            lambda item: check(client.post('/search', json={'query': item[1], 'top_n': top_n})),
+            texts, concurrency,
+        ),
+        'http /reverse': measure(
+            lambda point: check(client.get('/reverse', params={'lat': point[0], 'lon': point[1]})),
+            coords, concurrency,
+        ),
+        'http /compare': measure(
+            lambda pair: check(client.post('/compare', json={'address_1': pair[0], 'address_2': pair[1]})),
+            pairs, concurrency,
+        ),
+    }
+
+
+def bench_size(size: int, args, mix: Dict[str, float]) -> Dict[str, Any]:
+    path = dataset_path(args.data_dir, size, args.seed)
+    report: Dict[str, Any] = {'size': size, 'rss_before_mb': rss_mb()}
+
+    start = time.perf_counter()
+    geocoder = GeocoderAlgorithm(dataset_path=path)
+    report['build_s'] = time.perf_counter() - start
+    report['rss_mb'] = rss_mb()
+    model = geocoder.model
+
+    texts, coords, pairs = make_workload(model.dataset.address, args.queries, args.points, mix, args.seed)
+    results: Dict[str, Dict[str, float]] = {}
+
+    model.invalidate_cache()
+    results['search'] = measure(lambda item: model.search(item[1], top_n=args.top_n), texts)
+    for kind in mix:
+        model.invalidate_cache()
+        results[f'search[{kind}]'] = measure(
+            lambda item: model.search(item[1], top_n=args.top_n),
+            [item for item in texts if item[0] == kind],
+        )
+    results['address_by_coords'] = measure(lambda point: model.address_by_coords(*point), coords)
+    model.invalidate_cache()
+    results['compare'] = measure(lambda pair: geocoder.compare(*pair), pairs)
+
+    if args.http or args.snapshot:
+        with tempfile.TemporaryDirectory(dir=args.data_dir) as snapshot:
+            model.save_snapshot(snapshot)
+            start = time.perf_counter()
+            GeocoderAlgorithm(snapshot_path=snapshot)
+            report['snapshot_load_s'] = time.perf_counter() - start
+            if args.http:
+                with app_client(snapshot) as client:
+                    results.update(bench_http(client, texts, coords, pairs, 1, args.top_n))
+
+    if args.url:
+        import httpx
+        with httpx.Client(base_url=args.url, timeout=60) as client:
+            results.update(bench_http(client, texts, coords, pairs, args.concurrency, args.top_n))
+
+    report['results'] = results
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    line = f"size {report['size']}: build {report['build_s']:.2f}s, RSS {report['rss_mb']:.0f} MiB"
+    if 'snapshot_load_s' in report:
+        line += f", snapshot load {report['snapshot_load_s']:.2f}s"
+    print(line)
+    print(f"  {'operation':<24}{'n':>6}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'qps':>9}")
+    for name, s in report['results'].items():
+        if not s['n']:
+            continue
+        print(
+            f"  {name:<24}{s['n']:>6}{s['mean_ms']:>9.2f}{s['p50_ms']:>9.2f}"
+            f"{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['qps']:>9.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк геокодера: время построения, RSS, задержки и пропускная способность')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=500, help='текстовых запросов на размер')
+    parser.add_argument('--points', type=int, default=500, help='точек для обратного геокодирования')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'доли видов запросов, по умолчанию {DEFAULT_MIX}')
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'geocoder-bench'))
+    parser.add_argument('--snapshot', action='store_true', help='замерить сохранение и загрузку снапшота')
+    parser.add_argument('--http', action='store_true', help='эндпоинты приложения в процессе (TestClient)')
+    parser.add_argument('--url', help='адрес запущенного сервиса для HTTP-нагрузки')
+    parser.add_argument('--concurrency', type=int, default=1, help='параллельных HTTP-клиентов для --url')
+    parser.add_argument('--json', help='сохранить результаты в JSON для сравнения между запусками')
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    mix = parse_mix(args.mix)
+    reports = []
+    for size in args.sizes:
+        report = bench_size(size, args, mix)
+        print_report(report)
+        reports.append(report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'reports': reports}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
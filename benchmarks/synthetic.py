@@ -0,0 +1,87 @@
+import csv
+import random
+from typing import Iterator, List
+
+STREETS = [
+    'тверская', 'ленина', 'мира', 'садовая', 'арбат', 'новый_арбат', 'профсоюзная',
+    'ленинский', 'вавилова', 'пушкина', 'гагарина', 'кутузовский', 'маросейка',
+    'покровка', 'пятницкая', 'большая_ордынка', 'никольская', 'мясницкая',
+    'сретенка', 'варварка', 'ильинка', 'остоженка', 'пречистенка', 'волхонка',
+    'таганская', 'марксистская', 'земляной_вал', 'люсиновская', 'шаболовка',
+    'донская', 'вернадского', 'удальцова', 'лобачевского', 'обручева',
+]
+
+NAMES = ['', '', '', '', 'Пятёрочка', 'Аптека', 'Кофейня', 'Почта России', 'Школа']
+
+# Центр и разброс координат примерно по границам Москвы
+LAT_RANGE = (55.55, 55.92)
+LON_RANGE = (37.35, 37.85)
+
+
+def iter_rows(size: int, seed: int = 42) -> Iterator[List]:
+    """Строки датасета в формате data/dataset.csv: id, osm_type, lat, lon, name, address"""
+    rnd = random.Random(seed)
+    streets = list(STREETS)
+    # на больших размерах добавляем синтетические улицы, чтобы не плодить дубликаты адресов
+    for i in range(max(0, size // 2000 - len(streets))):
+        streets.append(f'{rnd.choice(STREETS)}_{i}')
+
+    for i in range(size):
+        address = f'город москва улица {rnd.choice(streets)} дом {rnd.randint(1, 200)}'
+        if rnd.random() < 0.3:
+            address += f' корпус {rnd.randint(1, 5)}'
+        yield [
+            i,
+            'way',
+            round(rnd.uniform(*LAT_RANGE), 7),
+            round(rnd.uniform(*LON_RANGE), 7),
+            rnd.choice(NAMES),
+            address,
+        ]
+
+
+def generate_rows(size: int, seed: int = 42) -> List[List]:
+    return list(iter_rows(size, seed))
+
+
+def write_dataset(path: str, size: int, seed: int = 42) -> str:
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'osm_type', 'lat', 'lon', 'name', 'address'])
+        writer.writerows(iter_rows(size, seed))
+    return path
+
+
+QUERY_KINDS = ('clean', 'abbreviated', 'typo')
+
+
+def _typo(word: str, rnd: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = rnd.randrange(1, len(word) - 1)
+    op = rnd.choice(('swap', 'drop', 'replace'))
+    if op == 'swap':
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if op == 'drop':
+        return word[:i] + word[i + 1:]
+    return word[:i] + rnd.choice('аеиоуя') + word[i + 1:]
+
+
+def make_query(address: str, kind: str, rnd: random.Random) -> str:
+    """
+    Пользовательский запрос к адресу датасета вида
+    'город москва улица <улица> дом <N> [корпус <K>]':
+    clean - полная запись, abbreviated - сокращения, typo - опечатка в названии улицы.
+    """
+    parts = address.split(' ')
+    street = parts[parts.index('улица') + 1].replace('_', ' ')
+    house = parts[parts.index('дом') + 1]
+    building = parts[parts.index('корпус') + 1] if 'корпус' in parts else None
+
+    if kind == 'typo':
+        street = ' '.join(_typo(word, rnd) for word in street.split(' '))
+    if kind == 'abbreviated':
+        query = f'{street.title()} ул {house}' + (f' к{building}' if building else '')
+    else:
+        query = f'г. Москва, ул. {street.title()}, д. {house}' + (f', корп. {building}' if building else '')
+    return query
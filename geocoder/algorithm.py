@@ -1,101 +1,160 @@
-import pandas as pd
+import gc
+import threading
 from typing import List, Optional, Tuple, Dict, Any
 from geocoder.model import SearchAddressModel
+from geocoder.store import AddressRecord
+from geocoder.utils import DATASET_NAME, DEFAULT_WEIGHTS
 
 class GeocoderAlgorithm:
-    def __init__(self):
-        self.model = SearchAddressModel()
+    def __init__(self, dataset_path: str = "./data/" + DATASET_NAME, snapshot_path: Optional[str] = None):
+        self.model = SearchAddressModel(dataset_path, snapshot_path=snapshot_path)
+        self.__updates = threading.Lock()
+        self.__compacting = threading.Lock()
+        self.__compaction: Optional[threading.Thread] = None
+        # изменения, пришедшие во время сборки уплотнённой модели (None - уплотнение не идёт)
+        self.__journal: Optional[List[Tuple[str, List]]] = None
+        self.__pending_updates = 0
+
+    @property
+    def pending_updates(self) -> int:
+        """Сколько адресов изменено upsert / delete после загрузки (в источнике их нет)"""
+        return self.__pending_updates
+
+    def upsert(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Добавление или замена адресов по id (см. SearchAddressModel.upsert)"""
+        with self.__updates:
+            result = self.model.upsert(records)
+            self.__pending_updates += result['added'] + result['replaced']
+            if self.__journal is not None:
+                self.__journal.append(('upsert', records))
+        return {**result, **self.__maybe_compact()}
+
+    def delete(self, ids: List[int]) -> Dict[str, Any]:
+        """Удаление адресов по id"""
+        with self.__updates:
+            result = self.model.delete(ids)
+            self.__pending_updates += result['deleted']
+            if self.__journal is not None:
+                self.__journal.append(('delete', ids))
+        return {**result, **self.__maybe_compact()}
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        Пересборка индексов по живым строкам и замена модели. Сборка идёт без блокировки:
+        поиск и изменения продолжают работать со старой моделью, изменения за время сборки
+        записываются и повторяются на новой модели под блокировкой перед заменой.
+        """
+        with self.__compacting:
+            with self.__updates:
+                model = self.model
+                if not model.has_delta:
+                    return {'compacting': False, 'index': model.index_stats()}
+                state = model.compaction_state()
+                self.__journal = []
+            try:
+                compacted = model.compacted(state)
+            except BaseException:
+                with self.__updates:
+                    self.__journal = None
+                raise
+            with self.__updates:
+                for method, argument in self.__journal:
+                    getattr(compacted, method)(argument)
+                self.__journal = None
+                self.model = compacted
+        # индексы старой модели связаны циклическими ссылками (модель <-> скореры)
+        gc.collect()
+        return {'compacting': False, 'index': self.model.index_stats()}
+
+    def __maybe_compact(self) -> Dict[str, Any]:
+        """Фоновое уплотнение, когда дельта превысила порог (DELTA_COMPACT_ROWS / DELTA_COMPACT_RATIO)"""
+        with self.__updates:
+            running = self.__compaction is not None and self.__compaction.is_alive()
+            if not running and self.model.needs_compaction():
+                self.__compaction = threading.Thread(target=self.compact, name='geocoder-compaction', daemon=True)
+                self.__compaction.start()
+                running = True
+            return {'compacting': running, 'index': self.model.index_stats()}
+
+    def __weights(
+        self,
+        weights: Optional[Dict[str, float]],
+        algorithms: Optional[List[str]] = None,
+    ) -> Dict[str, float]:
+        """
+        Веса алгоритмов для модели. Если задан algorithms, запускаются только перечисленные
+        алгоритмы (вес по умолчанию 1.0), иначе - DEFAULT_WEIGHTS. Алгоритмы с нулевым весом не запускаются.
+        """
+        result = {name: 1.0 for name in algorithms} if algorithms else dict(DEFAULT_WEIGHTS)
+
+        if weights:
+            for name, weight in weights.items():
+                if not algorithms or name in algorithms:
+                    result[name] = float(weight)
+
+        return result
 
     def search(
         self,
         query: str,
         top_n: int = 5,
-        weights: Optional[Dict[str, float]] = None
+        weights: Optional[Dict[str, float]] = None,
+        algorithms: Optional[List[str]] = None,
     ):
-        w1 = 1.0
-        w2 = 1.0
+        return self.search_batch([query], top_n=top_n, weights=weights, algorithms=algorithms)[0]
 
-        if weights:
-            w1 = float(weights.get("dl", w1))
-            w2 = float(weights.get("bm25", w2))
-
-        if w1 == 0 and w2 == 0:
-            return []
-
-        df = self.model.search(query, top_n=top_n, w1=w1, w2=w2)
-
-        objects = []
-        for _, row in df.iterrows():
-            address_str = str(row["address"])
-            locality = ""
-            street = ""
-            number = ""
-            building = ""
-            parts = address_str.split(' ')
-            i = 0
-            while i < len(parts):
-                part = parts[i]
-                if part == 'город' and i + 1 < len(parts):
-                    locality = parts[i + 1].capitalize()
-                    i += 2
-                elif part == 'улица' and i + 1 < len(parts):
-                    street_parts = []
-                    i += 1
-                    while i < len(parts):
-                        if (parts[i].startswith("дом") or parts[i].startswith("корпус")):
-                            break
-                        for elem in parts[i].capitalize().split('_'):
-                            street_parts.append(elem)
-                        i += 1
-                    street = " ".join(street_parts)
-                elif part.startswith('дом'):
-                    num = part[3:]
-                    if not num and i + 1 < len(parts):
-                        number = parts[i + 1]
-                        i += 2
-                    else:
-                        number = num
-                        i += 1
-                elif part.startswith('корпус'):
-                    bldg = part[6:]
-                    if not bldg and i + 1 < len(parts):
-                        building = parts[i + 1]
-                        i += 2
-                    else:
-                        building = bldg
-                        i += 1
-                else:
-                    i += 1
-            full_number = number
-            if building:
-                full_number = f"{number} корп.{building}" if number else f"корп.{building}"
-
-            objects.append({
-                "locality": locality or "Москва",
-                "street": street,
-                "number": full_number,
-                "lat": float(row["lat"]),
-                "lon": float(row["lon"]),
-                "name": row["name"] if row["name"] else '',
-                "score": float(row["score"]),
-            })
+    def search_batch(
+        self,
+        queries: List[str],
+        top_n: int = 5,
+        weights: Optional[Dict[str, float]] = None,
+        algorithms: Optional[List[str]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Поиск по пачке запросов одним проходом по корпусу, результаты в порядке запросов.
+        """
+        return [
+            self.__to_objects(records)
+            for records in self.model.find_batch(queries, top_n=top_n, weights=self.__weights(weights, algorithms))
+        ]
 
-        return objects
+    def __to_objects(self, records: List[AddressRecord]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "locality": record.locality,
+                "street": record.street,
+                "number": record.number,
+                "lat": record.lat,
+                "lon": record.lon,
+                "name": record.name,
+                "score": record.score,
+            }
+            for record in records
+        ]
 
     def reverse(
         self,
         lat: float,
         lon: float,
+        limit: int = 1,
+        radius_m: Optional[float] = None,
     ) -> List[Dict[str, Any]]:
-        objects: List[Dict[str, Any]] = []
-        objects.append(
+        """
+        limit ближайших к точке адресов (в пределах radius_m, если задан)
+        с координатами зданий и расстоянием до точки, по возрастанию расстояния.
+        """
+        return [
             {
-                "address": self.model.address_by_coords(lat, lon),
-                "lat": lat,
-                "lon": lon, 
+                "address": record.address,
+                "locality": record.locality,
+                "street": record.street,
+                "number": record.number,
+                "lat": record.lat,
+                "lon": record.lon,
+                "distance_m": record.distance_m,
             }
-        )
-        return objects
+            for record in self.model.nearest(lat, lon, limit=limit, radius_m=radius_m)
+        ]
 
     def get_best_candidate(
         self,
@@ -104,13 +163,61 @@ class GeocoderAlgorithm:
         algorithms: Optional[List[str]] = None,
     ) -> Optional[Dict[str, Any]]:
         """
-        Берём top_n=1 из search() и возвращаем одну запись.
+        Берём top_n=1 из search() с весами и алгоритмами запроса и возвращаем одну запись.
         """
-        results = self.search(query=query, top_n=1)
+        results = self.search(query=query, top_n=1, weights=weights, algorithms=algorithms)
         if not results:
             return None
         return results[0]
 
+    def compare(
+        self,
+        address_1: str,
+        address_2: str,
+        weights: Optional[Dict[str, float]] = None,
+        algorithms: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        return self.compare_batch([(address_1, address_2)], weights=weights, algorithms=algorithms)[0]
+
+    def compare_batch(
+        self,
+        pairs: List[Tuple[str, str]],
+        weights: Optional[Dict[str, float]] = None,
+        algorithms: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Сравнение пар адресов: адреса всех пар разрешаются одним search_batch
+        (общая нормализация, одинаковые адреса считаются один раз), затем для каждой
+        пары - расстояние в метрах и similarity = max(0, 1 - distance_m / 1000).
+        """
+        queries = [address for pair in pairs for address in pair]
+        best = [
+            objects[0] if objects else None
+            for objects in self.search_batch(queries, top_n=1, weights=weights, algorithms=algorithms)
+        ]
+
+        results = []
+        for i, (address_1, address_2) in enumerate(pairs):
+            c1, c2 = best[2 * i], best[2 * i + 1]
+            distance_m = None
+            similarity = None
+            if c1 and c2:
+                distance_m = self.haversine_distance_m(c1["lat"], c1["lon"], c2["lat"], c2["lon"])
+                similarity = max(0.0, 1.0 - distance_m / 1000.0)
+            results.append({
+                "address_1": address_1,
+                "address_2": address_2,
+                "distance_m": distance_m,
+                "similarity": similarity,
+                "point_1": c1,
+                "point_2": c2,
+            })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кэша и размеры индексов модели"""
+        return {"cache": self.model.cache.stats(), "index": self.model.index_stats()}
+
     def haversine_distance_m(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """
         Возвращает расстояние между двумя координатами в МЕТРАХ.
@@ -0,0 +1,283 @@
+import numpy as np
+from collections import Counter
+from scipy import sparse
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from geocoder.utils import *
+
+
+class _Delta(NamedTuple):
+    """Изменения после сборки: добавленные документы, удалённые документы и частоты термов"""
+    documents: List[np.ndarray]
+    postings: Optional[sparse.csr_matrix]
+    deleted: Optional[np.ndarray]
+    doc_freqs: np.ndarray
+    live: int
+
+
+class BM25Index:
+    """
+    Инвертированный индекс BM25 (вариант Okapi, как в rank_bm25.BM25Okapi).
+
+    Постинги хранятся CSR-матрицей (термы x документы) с уже посчитанной
+    нормализацией по длине документа, IDF - отдельным вектором. Скоринг -
+    разреженное произведение вектора запроса на постинги, поэтому затрагиваются
+    только документы, в которых есть хотя бы одна n-грамма запроса.
+
+    Документы, добавленные после сборки (add_documents), образуют небольшой
+    дельта-сегмент со своими постингами, удалённые (delete_documents) исключаются
+    из выдачи; частоты термов и IDF пересчитываются по живым документам, avgdl
+    остаётся от сборки до уплотнения (новой сборки индекса).
+    """
+
+    def __init__(self, corpus: List[List[str]], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        vocabulary: Dict[str, int] = {}
+        ids = [[vocabulary.setdefault(word, len(vocabulary)) for word in document] for document in corpus]
+        offsets = np.zeros(len(corpus) + 1, dtype=np.int64)
+        np.cumsum([len(document) for document in corpus], out=offsets[1:])
+        token_ids = np.fromiter((i for document in ids for i in document), dtype=np.int32, count=int(offsets[-1]))
+        self.__build(vocabulary, token_ids, offsets, k1, b, epsilon)
+
+    @classmethod
+    def from_token_ids(
+        cls,
+        vocabulary: Dict[str, int],
+        token_ids: np.ndarray,
+        offsets: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> 'BM25Index':
+        """Индекс по уже закодированным n-граммам: token_ids документа i - token_ids[offsets[i]:offsets[i + 1]]"""
+        index = cls.__new__(cls)
+        index.__build(vocabulary, token_ids, offsets, k1, b, epsilon)
+        return index
+
+    def __build(self, vocabulary: Dict[str, int], token_ids: np.ndarray, offsets: np.ndarray,
+                k1: float, b: float, epsilon: float):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.vocabulary = vocabulary
+        self.corpus_size = len(offsets) - 1
+
+        doc_len = np.diff(offsets).astype(np.int32)
+        counts = self.__counts(token_ids, doc_len, len(vocabulary))
+
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.sum()) / self.corpus_size if self.corpus_size else 0.0
+        self.idf = self.__calc_idf(np.diff(counts.indptr), self.corpus_size)
+        self.postings = self.__weigh(counts, doc_len)
+        self.__reset_delta()
+
+    @staticmethod
+    def __counts(token_ids: np.ndarray, doc_len: np.ndarray, n_terms: int) -> sparse.csr_matrix:
+        """Частоты термов в документах (термы x документы): повторы (терм, документ) суммируются"""
+        doc_ids = np.repeat(np.arange(len(doc_len), dtype=np.int32), doc_len)
+        counts = sparse.csr_matrix(
+            (np.ones(len(token_ids), dtype=np.float64), (np.asarray(token_ids), doc_ids)),
+            shape=(n_terms, len(doc_len)),
+        )
+        counts.sum_duplicates()
+        return counts
+
+    def __weigh(self, counts: sparse.csr_matrix, doc_len: np.ndarray) -> sparse.csr_matrix:
+        """Частоты -> вклад терма в скор документа без IDF (нормализация по длине документа)"""
+        freqs = counts.data
+        term_doc_ids = counts.indices
+        norm = self.k1 * (1 - self.b + self.b * doc_len[term_doc_ids] / self.avgdl) if self.avgdl else self.k1
+        counts.data = freqs * (self.k1 + 1) / (freqs + norm)
+        return counts
+
+    def __reset_delta(self):
+        self.__delta = _Delta([], None, None, np.diff(self.postings.indptr).astype(np.int64), self.corpus_size)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        vocabulary: List[str],
+        idf: np.ndarray,
+        postings: sparse.csr_matrix,
+        doc_len: np.ndarray,
+        avgdl: float,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> 'BM25Index':
+        """Индекс из готовых массивов (например, из снапшота) без пересчёта"""
+        index = cls.__new__(cls)
+        index.k1 = k1
+        index.b = b
+        index.epsilon = epsilon
+        index.corpus_size = len(doc_len)
+        index.vocabulary = {word: term_id for term_id, word in enumerate(vocabulary)}
+        index.doc_len = doc_len
+        index.avgdl = avgdl
+        index.idf = idf
+        index.postings = postings
+        index.__reset_delta()
+        return index
+
+    def __calc_idf(self, doc_freqs: np.ndarray, documents: int) -> np.ndarray:
+        """IDF с нижней границей epsilon * average_idf для частых термов"""
+        if len(doc_freqs) == 0:
+            return np.zeros(0, dtype=np.float64)
+        idf = np.log(documents - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        eps = self.epsilon * float(idf.mean())
+        idf[idf < 0] = eps
+        return idf
+
+    @property
+    def live_size(self) -> int:
+        """Число неудалённых документов"""
+        return self.__delta.live
+
+    @property
+    def delta_size(self) -> int:
+        return len(self.__delta.documents)
+
+    @property
+    def deleted(self) -> Optional[np.ndarray]:
+        """Маска удалённых документов (None - удалений не было)"""
+        return self.__delta.deleted
+
+    def add_documents(self, vocabulary: Dict[str, int], documents: Sequence[np.ndarray]):
+        """
+        Добавление документов (id термов по vocabulary - словарю индекса, пополненному
+        новыми n-граммами) в дельта-сегмент; номера документов продолжают корпус.
+        """
+        delta = self.__delta
+        documents = delta.documents + [np.asarray(document, dtype=np.int32) for document in documents]
+        n_terms = len(vocabulary)
+        doc_len = np.array([len(document) for document in documents], dtype=np.int32)
+        token_ids = np.concatenate(documents) if documents else np.zeros(0, dtype=np.int32)
+        postings = self.__weigh(self.__counts(token_ids, doc_len, n_terms), doc_len)
+
+        added = len(documents) - len(delta.documents)
+        doc_freqs = np.zeros(n_terms, dtype=np.int64)
+        doc_freqs[:len(delta.doc_freqs)] = delta.doc_freqs
+        for document in documents[-added:] if added else ():
+            doc_freqs[np.unique(document)] += 1
+        deleted = delta.deleted
+        if deleted is not None:
+            deleted = np.concatenate([deleted, np.zeros(added, dtype=bool)])
+        self.__publish(vocabulary, _Delta(documents, postings, deleted, doc_freqs, delta.live + added))
+
+    def delete_documents(self, doc_ids: Sequence[int], documents: Sequence[np.ndarray]):
+        """Исключение документов doc_ids (documents - их id термов) из выдачи и частот термов"""
+        delta = self.__delta
+        deleted = np.zeros(self.corpus_size, dtype=bool) if delta.deleted is None else delta.deleted.copy()
+        doc_freqs = delta.doc_freqs.copy()
+        removed = 0
+        for doc_id, document in zip(doc_ids, documents):
+            if deleted[doc_id]:
+                continue
+            deleted[doc_id] = True
+            doc_freqs[np.unique(document)] -= 1
+            removed += 1
+        self.__publish(self.vocabulary, delta._replace(deleted=deleted, doc_freqs=doc_freqs, live=delta.live - removed))
+
+    def __publish(self, vocabulary: Dict[str, int], delta: _Delta):
+        # порядок присваиваний важен для параллельных запросов: кто видит новый словарь,
+        # видит и новые IDF с дельтой (см. __state)
+        self.idf = self.__calc_idf(delta.doc_freqs, delta.live)
+        self.__delta = delta
+        self.corpus_size = len(self.doc_len) + len(delta.documents)
+        self.vocabulary = vocabulary
+
+    def __state(self) -> Tuple[Dict[str, int], np.ndarray, _Delta]:
+        """Согласованные словарь, IDF и дельта: читаются в обратном порядке присваивания"""
+        vocabulary = self.vocabulary
+        return vocabulary, self.idf, self.__delta
+
+    def __query_matrix(self, queries: List[List[str]], vocabulary: Dict[str, int], idf: np.ndarray,
+                       n_terms: int) -> sparse.csr_matrix:
+        """Матрица запросов (запросы x термы): count(term) * idf(term), неизвестные термы отбрасываются"""
+        rows = []
+        cols = []
+        values = []
+        for row, query in enumerate(queries):
+            for word, count in Counter(query).items():
+                term_id = vocabulary.get(word)
+                if term_id is None:
+                    continue
+                rows.append(row)
+                cols.append(term_id)
+                values.append(count * idf[term_id])
+        return sparse.csr_matrix(
+            (values, (rows, cols)),
+            shape=(len(queries), n_terms),
+        )
+
+    def __scores(self, queries: List[List[str]], state: Tuple) -> sparse.csr_matrix:
+        vocabulary, idf, delta = state
+        base_terms = self.postings.shape[0]
+        if delta.postings is None:
+            query = self.__query_matrix(queries, vocabulary, idf, max(len(vocabulary), base_terms))
+            return (query[:, :base_terms] if query.shape[1] > base_terms else query) @ self.postings
+        query = self.__query_matrix(queries, vocabulary, idf, delta.postings.shape[0])
+        return sparse.hstack([query[:, :base_terms] @ self.postings, query @ delta.postings], format='csr')
+
+    def get_scores_many(self, queries: List[List[str]]) -> sparse.csr_matrix:
+        """Разреженная матрица скоров (запросы x документы), удалённые документы не исключаются"""
+        return self.__scores(queries, self.__state()).tocsr()
+
+    def term_matches(self, term_ids: Sequence[int]) -> np.ndarray:
+        """Сколько из термов term_ids есть в каждом документе (вектор по всем номерам документов)"""
+        delta = self.__delta
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        base = self.postings[term_ids[term_ids < self.postings.shape[0]]]
+        counts = np.bincount(base.indices, minlength=len(self.doc_len))
+        if delta.postings is None:
+            return counts
+        added = delta.postings[term_ids[term_ids < delta.postings.shape[0]]]
+        return np.concatenate([counts, np.bincount(added.indices, minlength=len(delta.documents))])
+
+    def distinct_terms(self) -> np.ndarray:
+        """Число различных термов в каждом документе"""
+        if getattr(self, '_BM25Index__distinct', None) is None:
+            self.__distinct = np.bincount(self.postings.indices, minlength=len(self.doc_len))
+        delta = self.__delta
+        if delta.postings is None:
+            return self.__distinct
+        return np.concatenate([self.__distinct, np.bincount(delta.postings.indices, minlength=len(delta.documents))])
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        """Плотный вектор скоров по всему корпусу, совместим с BM25Okapi.get_scores"""
+        return self.get_scores_many([query]).toarray()[0]
+
+    def top_n(self, queries: List[List[str]], top_n: int) -> List[List[Tuple[int, float]]]:
+        """
+        Для каждого запроса возвращает top_n пар (idx, score) с положительным скором,
+        score нормирован на максимальный скор запроса.
+        """
+        results = []
+        state = self.__state()
+        deleted = state[2].deleted
+        chunk = max(1, MAX_MATRIX_CELLS // max(1, self.corpus_size))
+        for offset in range(0, len(queries), chunk):
+            scores = self.__scores(queries[offset:offset + chunk], state).tocsr()
+            for row in range(scores.shape[0]):
+                start, end = scores.indptr[row], scores.indptr[row + 1]
+                doc_ids, values = scores.indices[start:end], scores.data[start:end]
+                if deleted is not None:
+                    live = ~deleted[doc_ids]
+                    doc_ids, values = doc_ids[live], values[live]
+                results.append(self.__row_top_n(doc_ids, values, top_n))
+        return results
+
+    @staticmethod
+    def __row_top_n(doc_ids: np.ndarray, values: np.ndarray, top_n: int) -> List[Tuple[int, float]]:
+        positive = values > 0
+        doc_ids = doc_ids[positive]
+        values = values[positive]
+        if top_n <= 0 or len(values) == 0:
+            return []
+
+        max_score = float(values.max())
+        top_k = min(top_n, len(values))
+        if top_k < len(values):
+            candidates = np.argpartition(-values, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(len(values))
+        candidates = candidates[np.lexsort((doc_ids[candidates], -values[candidates]))]
+        return [(int(doc_ids[i]), float(values[i]) / max_score) for i in candidates]
@@ -0,0 +1,298 @@
+"""
+Потоковое пакетное геокодирование больших файлов (CSV / NDJSON).
+
+Вход читается построчно, строки собираются в пачки по chunk_size и скорятся
+через GeocoderAlgorithm.search_batch в пуле потоков. Одновременно в обработке
+не больше max_in_flight пачек, поэтому память ограничена независимо от размера
+файла, а результаты отдаются по мере готовности в порядке входа.
+
+    python -m geocoder.bulk addresses.csv --format csv > result.ndjson
+"""
+import argparse
+import csv
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from geocoder.utils import *
+
+QUERY_COLUMNS = ('query', 'address')
+
+
+class BulkProgress:
+    """Счётчики прогресса пакетной обработки (потокобезопасные)"""
+
+    def __init__(self):
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.chunks = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.__lock = threading.Lock()
+
+    def add_received(self, count: int = 1):
+        with self.__lock:
+            self.received += count
+
+    def add_chunk(self, processed: int, failed: int):
+        with self.__lock:
+            self.processed += processed
+            self.failed += failed
+            self.chunks += 1
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "finished": self.finished_at is not None,
+            "elapsed_s": elapsed,
+            "rate_per_s": self.processed / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class _LineFeed:
+    """Источник строк для csv.reader, пополняемый по мере чтения входа"""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+class QueryLineParser:
+    """
+    Достаёт строку запроса из строки входа.
+    ndjson: {"query": "..."} / {"address": "..."} или просто JSON-строка.
+    csv: колонка query/address, если первая строка - заголовок, иначе первая колонка.
+    Строки CSV идут в один csv.reader: поле в кавычках может занимать несколько строк,
+    запись разбирается, когда кавычки в ней закрыты; record_lines - сколько строк она заняла.
+    """
+
+    def __init__(self, fmt: str = 'ndjson'):
+        if fmt not in ('ndjson', 'csv'):
+            raise ValueError(f"Неизвестный формат: {fmt}")
+        self.fmt = fmt
+        self.record_lines = 1
+        self.__column: Optional[int] = None
+        self.__feed = _LineFeed()
+        self.__reader = csv.reader(self.__feed)
+        self.__buffered = 0
+        self.__quotes = 0
+
+    def parse(self, line: str) -> Optional[str]:
+        """
+        None - строку нужно пропустить (пустая, заголовок CSV или незаконченная запись CSV),
+        ValueError - строка битая
+        """
+        if self.fmt == 'csv':
+            return self.__parse_csv(line)
+        line = line.strip()
+        if not line:
+            return None
+        return self.__parse_ndjson(line)
+
+    def finish(self):
+        """Конец входа: ValueError, если последняя запись CSV оборвалась внутри кавычек"""
+        if self.__buffered:
+            self.record_lines, self.__buffered, self.__quotes = self.__buffered, 0, 0
+            self.__feed.lines.clear()
+            raise ValueError("Незакрытая кавычка в CSV")
+
+    def __parse_ndjson(self, line: str) -> str:
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Некорректный JSON: {e.msg}")
+        if isinstance(value, str):
+            return value
+        if isinstance(value, dict):
+            for key in QUERY_COLUMNS:
+                if isinstance(value.get(key), str):
+                    return value[key]
+        raise ValueError("Ожидается строка или объект с полем query/address")
+
+    def __parse_csv(self, line: str) -> Optional[str]:
+        if not self.__buffered and not line.strip():
+            return None
+        self.__feed.lines.append(line.rstrip('\r\n') + '\n')
+        self.__buffered += 1
+        # экранированная кавычка - двойная, поэтому нечётное число кавычек значит открытое поле
+        self.__quotes += line.count('"')
+        if self.__quotes % 2:
+            return None
+        self.record_lines, self.__buffered, self.__quotes = self.__buffered, 0, 0
+        try:
+            row = next(self.__reader)
+        except csv.Error as e:
+            raise ValueError(f"Некорректная строка CSV: {e}")
+        if self.__column is None:
+            header = [cell.strip().lower() for cell in row]
+            for key in QUERY_COLUMNS:
+                if key in header:
+                    self.__column = header.index(key)
+                    return None
+            self.__column = 0
+        if self.__column >= len(row):
+            raise ValueError("В строке нет колонки с адресом")
+        return row[self.__column]
+
+
+class BulkGeocoder:
+    def __init__(
+        self,
+        geocoder,
+        chunk_size: int = BULK_CHUNK_SIZE,
+        workers: int = BULK_WORKERS,
+        max_in_flight: int = BULK_MAX_IN_FLIGHT,
+    ):
+        self.geocoder = geocoder
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+
+    def process_chunk(
+        self,
+        chunk: List[Tuple[int, Optional[str], Optional[str]]],
+        top_n: int = 1,
+        weights: Optional[Dict[str, float]] = None,
+        progress: Optional[BulkProgress] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Геокодирует пачку (номер строки, запрос, ошибка разбора) одним вызовом search_batch
+        и возвращает записи результата в порядке входа.
+        """
+        queries = self.chunk_queries(chunk)
+        return self.chunk_records(chunk, self.geocoder.search_batch(queries, top_n=top_n, weights=weights), progress)
+
+    @staticmethod
+    def chunk_queries(chunk: List[Tuple[int, Optional[str], Optional[str]]]) -> List[str]:
+        """Запросы пачки без строк с ошибкой разбора"""
+        return [query for _, query, error in chunk if error is None]
+
+    @staticmethod
+    def chunk_records(
+        chunk: List[Tuple[int, Optional[str], Optional[str]]],
+        results: List[List[Dict[str, Any]]],
+        progress: Optional[BulkProgress] = None,
+    ) -> List[Dict[str, Any]]:
+        """Записи результата пачки в порядке входа по результатам search_batch для chunk_queries"""
+        results = iter(results)
+        records = []
+        for line_no, query, error in chunk:
+            if error is None:
+                records.append({"line": line_no, "query": query, "objects": next(results)})
+            else:
+                records.append({"line": line_no, "error": error})
+
+        if progress is not None:
+            processed = sum(error is None for _, _, error in chunk)
+            progress.add_chunk(processed=processed, failed=len(chunk) - processed)
+        return records
+
+    @staticmethod
+    def parse_line(
+        line_no: int,
+        line: Optional[str],
+        parser: QueryLineParser,
+        progress: Optional[BulkProgress] = None,
+    ) -> Optional[Tuple[int, Optional[str], Optional[str]]]:
+        """
+        Элемент пачки (номер первой строки записи, запрос, ошибка разбора) или None для
+        пропускаемых строк. line=None - конец входа (оборванная запись CSV - ошибка).
+        """
+        try:
+            query = parser.parse(line) if line is not None else parser.finish()
+            error = None
+        except ValueError as e:
+            query, error = None, str(e)
+        if query is None and error is None:
+            return None
+
+        if progress is not None:
+            progress.add_received()
+        return line_no - parser.record_lines + 1, query, error
+
+    def iter_chunks(
+        self,
+        lines: Iterable[str],
+        parser: QueryLineParser,
+        progress: Optional[BulkProgress] = None,
+    ) -> Iterator[List[Tuple[int, Optional[str], Optional[str]]]]:
+        """Ленивое разбиение входа на пачки по chunk_size строк"""
+        chunk = []
+        line_no = 0
+        for line in itertools.chain(lines, [None]):
+            line_no += line is not None
+            item = self.parse_line(line_no, line, parser, progress)
+            if item is None:
+                continue
+
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def iter_results(
+        self,
+        lines: Iterable[str],
+        fmt: str = 'ndjson',
+        top_n: int = 1,
+        weights: Optional[Dict[str, float]] = None,
+        progress: Optional[BulkProgress] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Синхронная потоковая обработка: записи результата по мере готовности пачек"""
+        parser = QueryLineParser(fmt)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for chunk in self.iter_chunks(lines, parser, progress):
+                pending.append(executor.submit(self.process_chunk, chunk, top_n, weights, progress))
+                while len(pending) >= self.max_in_flight:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+        if progress is not None:
+            progress.finish()
+
+
+def main():
+    from geocoder.algorithm import GeocoderAlgorithm
+
+    parser = argparse.ArgumentParser(description="Потоковое пакетное геокодирование в NDJSON")
+    parser.add_argument('input', help="Файл с адресами ('-' - stdin)")
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    parser.add_argument('--top-n', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=BULK_WORKERS)
+    args = parser.parse_args()
+
+    bulk = BulkGeocoder(GeocoderAlgorithm(), chunk_size=args.chunk_size, workers=args.workers)
+    progress = BulkProgress()
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    with source:
+        for record in bulk.iter_results(source, fmt=args.format, top_n=args.top_n, progress=progress):
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+    print(json.dumps(progress.as_dict()), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
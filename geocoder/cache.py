@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+from geocoder.utils import *
+
+
+class QueryCache:
+    """
+    Потокобезопасный LRU-кэш с TTL. При переполнении вытесняется давно не
+    использованная запись, записи старше ttl секунд считаются промахом.
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if self.maxsize <= 0:
+            return None
+        with self.__lock:
+            entry = self.__data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.__data[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self.__data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self.__lock:
+            self.__data[key] = (time.monotonic() + self.ttl, value)
+            self.__data.move_to_end(key)
+            while len(self.__data) > self.maxsize:
+                self.__data.popitem(last=False)
+                self.evictions += 1
+
+    def keys(self, limit: int) -> List[Hashable]:
+        """До limit последних использованных действующих ключей, начиная с самого свежего"""
+        now = time.monotonic()
+        with self.__lock:
+            recent = []
+            for key, entry in reversed(self.__data.items()):
+                if len(recent) >= limit:
+                    break
+                if entry[0] >= now:
+                    recent.append(key)
+        return recent
+
+    def clear(self):
+        """Сброс всех записей (например, после изменения индекса)"""
+        with self.__lock:
+            self.__data.clear()
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.__data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
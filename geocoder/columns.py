@@ -0,0 +1,107 @@
+import numpy as np
+from typing import Iterator, List, Sequence, Tuple
+
+
+def pack_strings(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Упаковка строк в один UTF-8 буфер (разделитель - NUL) и массив смещений начала строк в байтах.
+    """
+    encoded = [str(value).replace('\x00', '').encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        np.cumsum([len(value) + 1 for value in encoded], out=offsets[1:])
+    buffer = np.frombuffer(b'\x00'.join(encoded) + b'\x00', dtype=np.uint8) if encoded else np.zeros(0, np.uint8)
+    return buffer, offsets
+
+
+def unpack_strings(buffer: np.ndarray, offsets: np.ndarray) -> List[str]:
+    """Обратная операция к pack_strings для всего буфера сразу"""
+    if len(offsets) <= 1:
+        return []
+    return str(memoryview(buffer[:-1]), 'utf-8').split('\x00')
+
+
+def gather_ranges(data: np.ndarray, offsets: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Выборка диапазонов data[offsets[i]:offsets[i + 1]] для indices одним векторным
+    копированием: новые данные и смещения.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    starts = np.asarray(offsets)[indices]
+    lengths = np.asarray(offsets)[indices + 1] - starts
+    new_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    positions = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1], dtype=np.int64)
+    return np.asarray(data)[positions], new_offsets
+
+
+class StringColumn:
+    """
+    Колонка строк поверх упакованного UTF-8 буфера и смещений (в том числе mmap из снапшота).
+    Строки декодируются по требованию, поэтому процессы, открывшие один снапшот,
+    делят данные через page cache вместо собственных копий Python-строк.
+    Строки, добавленные после упаковки (extend), лежат в списке tail до select.
+    """
+
+    def __init__(self, buffer: np.ndarray, offsets: np.ndarray):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.tail: List[str] = []
+
+    @classmethod
+    def from_list(cls, values: Sequence[str]) -> 'StringColumn':
+        return cls(*pack_strings(values))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1 + len(self.tail)
+
+    def __getitem__(self, idx: int) -> str:
+        packed = len(self.offsets) - 1
+        if idx >= packed:
+            return self.tail[idx - packed]
+        start, end = self.offsets[idx], self.offsets[idx + 1] - 1
+        return str(memoryview(self.buffer[start:end]), 'utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for start in range(0, len(self), 100_000):
+            yield from self.slice(start, start + 100_000)
+
+    def slice(self, start: int, stop: int) -> List[str]:
+        """Декодирование непрерывного диапазона строк за один проход"""
+        stop = min(stop, len(self))
+        if start >= stop:
+            return []
+        packed = len(self.offsets) - 1
+        values = []
+        if start < packed:
+            end = min(stop, packed)
+            values = str(memoryview(self.buffer[self.offsets[start]:self.offsets[end] - 1]), 'utf-8').split('\x00')
+        if stop > packed:
+            values.extend(self.tail[max(start, packed) - packed:stop - packed])
+        return values
+
+    def take(self, indices: Sequence[int]) -> List[str]:
+        return [self[int(idx)] for idx in indices]
+
+    def to_list(self) -> List[str]:
+        return self.slice(0, len(self))
+
+    def extend(self, values: Sequence[str]):
+        self.tail.extend(str(value).replace('\x00', '') for value in values)
+
+    def packed(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Буфер и смещения вместе с добавленными строками"""
+        # копия списка: строки могут дописываться параллельно
+        tail = list(self.tail)
+        if not tail:
+            return self.buffer, self.offsets
+        buffer, offsets = pack_strings(tail)
+        return (
+            np.concatenate([self.buffer, buffer]),
+            np.concatenate([self.offsets[:-1], offsets + self.offsets[-1]]),
+        )
+
+    def select(self, indices: Sequence[int]) -> 'StringColumn':
+        """Новая упакованная колонка из строк indices (без декодирования)"""
+        buffer, offsets = self.packed()
+        return StringColumn(*gather_ranges(buffer, offsets, indices))
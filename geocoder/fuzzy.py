@@ -0,0 +1,154 @@
+import numpy as np
+from rapidfuzz import process
+from rapidfuzz.distance import DamerauLevenshtein, JaroWinkler
+from typing import Iterator, List, Optional, Tuple, Union
+from geocoder.columns import StringColumn
+from geocoder.utils import *
+
+
+class DistanceScorer:
+    """
+    Пакетный расчёт строковых расстояний по всему корпусу в нативном коде
+    (rapidfuzz.process.cdist) с отбором top-k через np.argpartition.
+    Метрика задаётся в подклассах атрибутами scorer (расстояние rapidfuzz) и dtype.
+    """
+
+    def __init__(
+        self,
+        choices: Union[List[str], StringColumn],
+        workers: int = DL_WORKERS,
+        score_cutoff: Optional[float] = None,
+        max_matrix_cells: int = MAX_MATRIX_CELLS,
+    ):
+        self.choices = choices
+        self.workers = workers
+        self.score_cutoff = score_cutoff
+        self.max_matrix_cells = max_matrix_cells
+
+    def __choice_chunks(self, n: int) -> Iterator[Tuple[int, List[str]]]:
+        """
+        Первые n строк корпуса кусками (смещение, строки). Список отдаётся целиком, StringColumn
+        декодируется по DL_CHOICES_CHUNK строк, чтобы не держать весь корпус строками в памяти
+        (строки, добавленные в колонку во время расчёта, не попадают в матрицу).
+        """
+        if isinstance(self.choices, StringColumn):
+            for start in range(0, n, DL_CHOICES_CHUNK):
+                yield start, self.choices.slice(start, min(start + DL_CHOICES_CHUNK, n))
+        else:
+            yield 0, self.choices[:n]
+
+    def distances(self, queries: List[str]) -> np.ndarray:
+        """
+        Матрица расстояний (len(queries), len(choices)).
+        Если задан score_cutoff, расстояния больше порога равны score_cutoff + 1.
+        """
+        n = len(self.choices)
+        result = np.empty((len(queries), n), dtype=self.dtype)
+        if n == 0 or len(queries) == 0:
+            return result
+
+        for offset, choices in self.__choice_chunks(n):
+            result[:, offset:offset + len(choices)] = process.cdist(
+                queries,
+                choices,
+                scorer=self.scorer,
+                dtype=self.dtype,
+                workers=self.workers,
+                score_cutoff=self.score_cutoff,
+            )
+        return result
+
+    def top_n(self, queries: List[str], top_n: int) -> List[List[Tuple[int, float]]]:
+        """
+        Для каждого запроса возвращает top_n пар (idx, score), где score -
+        расстояние, нормированное в [0, 1] по min/max всего корпуса (1.0 - лучшее совпадение).
+        """
+        n = len(self.choices)
+        if n == 0 or top_n <= 0:
+            return [[] for _ in queries]
+
+        results = []
+        # матрица считается пачками запросов, чтобы не превышать max_matrix_cells
+        chunk = max(1, self.max_matrix_cells // n)
+        for start in range(0, len(queries), chunk):
+            matrix = self.distances(queries[start:start + chunk])
+            for row in matrix:
+                results.append(self.__row_top_n(row, top_n))
+        return results
+
+    def top_n_candidates(
+        self,
+        queries: List[str],
+        candidates: List[np.ndarray],
+        top_n: int,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        То же, что top_n, но расстояния считаются только до строк-кандидатов своего запроса,
+        а нормировка min/max - по множеству кандидатов.
+        """
+        results = []
+        for query, ids in zip(queries, candidates):
+            ids = np.asarray(ids, dtype=np.int64)
+            if len(ids) == 0 or top_n <= 0:
+                results.append([])
+                continue
+            if isinstance(self.choices, StringColumn):
+                choices = self.choices.take(ids)
+            else:
+                choices = [self.choices[idx] for idx in ids]
+            row = process.cdist(
+                [query],
+                choices,
+                scorer=self.scorer,
+                dtype=self.dtype,
+                workers=self.workers,
+                score_cutoff=self.score_cutoff,
+            )[0]
+            results.append([(int(ids[pos]), score) for pos, score in self.__row_top_n(row, top_n)])
+        return results
+
+    @staticmethod
+    def __row_top_n(row: np.ndarray, top_n: int) -> List[Tuple[int, float]]:
+        top_k = min(top_n, len(row))
+        if top_k < len(row):
+            candidates = np.argpartition(row, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(len(row))
+        # стабильный порядок: по расстоянию, затем по индексу строки
+        candidates = candidates[np.lexsort((candidates, row[candidates]))]
+
+        min_dist = float(row.min())
+        max_dist = float(row.max())
+        if max_dist == min_dist:
+            return [(int(idx), 0.5) for idx in candidates]
+
+        span = float(max_dist - min_dist)
+        result_top_n = []
+        for idx in candidates:
+            score = 1.0 - (float(row[idx]) - min_dist) / span
+            if score > 0:
+                result_top_n.append((int(idx), score))
+        return result_top_n
+
+
+class DamerauLevenshteinScorer(DistanceScorer):
+    """Расстояние Дамерау-Левенштейна (вставки, удаления, замены и перестановки символов)"""
+
+    scorer = staticmethod(DamerauLevenshtein.distance)
+    dtype = np.int32
+
+    def __init__(
+        self,
+        choices: Union[List[str], StringColumn],
+        workers: int = DL_WORKERS,
+        score_cutoff: Optional[int] = DL_SCORE_CUTOFF,
+        max_matrix_cells: int = MAX_MATRIX_CELLS,
+    ):
+        super().__init__(choices, workers, score_cutoff, max_matrix_cells)
+
+
+class JaroWinklerScorer(DistanceScorer):
+    """Расстояние Джаро-Винклера (1 - сходство): совпадение префикса весит больше"""
+
+    scorer = staticmethod(JaroWinkler.distance)
+    dtype = np.float32
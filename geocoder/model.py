@@ -2,25 +2,274 @@ import math
 import numpy as np
 import pandas as pd
 import re
-from rapidfuzz import distance
-from rank_bm25 import BM25Okapi
-from typing import List, Optional, Tuple
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from geocoder.bm25 import BM25Index
+from geocoder.cache import QueryCache
+from geocoder.columns import StringColumn
+from geocoder.fuzzy import DamerauLevenshteinScorer
+from geocoder.scorers import SCORERS
+from geocoder.snapshot import load_snapshot, save_snapshot
+from geocoder.spatial import SpatialIndex
+from geocoder.streets import StreetIndex
+from geocoder.store import AddressRecord, AddressStore, TokenColumn
+from geocoder.structured import StructuredIndex, parse_normalized
+from geocoder.timing import stage
 from geocoder.utils import *
 
 class SearchAddressModel:
-    def __init__(self):
-        self.dataset = pd.read_csv("./data/" + DATASET_NAME)
-        self.dataset.iloc[:, 5] = self.dataset.iloc[:, 5].fillna('')
-        self.tokenized_dataset = self.__preprocess_dataset()
-        self.bm25 = BM25Okapi(self.tokenized_dataset)
+    def __init__(self, dataset_path: str = "./data/" + DATASET_NAME, snapshot_path: Optional[str] = None):
+        if snapshot_path is not None:
+            self.__load_snapshot(snapshot_path)
+            return
+        
+        dataset = AddressStore.from_csv(dataset_path)
+        normalized = [self.__preprocess_address(address) for address in dataset.addresses()]
+        trigrams, vocabulary = TokenColumn.encode(normalized, self.__tokenize_address)
+        self.__init_indexes(
+            dataset,
+            StringColumn.from_list(normalized),
+            trigrams,
+            BM25Index.from_token_ids(vocabulary, trigrams.ids, trigrams.offsets),
+            SpatialIndex(dataset.lat, dataset.lon),
+            StructuredIndex.build(normalized),
+        )
     
-    def __preprocess_dataset(self) -> List[List[str]]:
-        """Препроцессинг адресов для BM25"""
-        tokenized = []
-        for address in self.dataset.iloc[:, 5]:
-            processed_addr = self.__preprocess_address(str(address))
-            tokenized.append(self.__tokenize_address(processed_addr))
-        return tokenized
+    def __load_snapshot(self, snapshot_path: str):
+        """Загрузка готовых индексов из снапшота (см. geocoder/snapshot.py) без чтения CSV и токенизации"""
+        parts = load_snapshot(snapshot_path)
+        self.__init_indexes(
+            parts['dataset'], parts['normalized'], parts['trigrams'],
+            parts['bm25'], parts['spatial'], parts['structured'],
+        )
+
+    def __init_indexes(
+        self,
+        dataset: AddressStore,
+        normalized: StringColumn,
+        trigrams: TokenColumn,
+        bm25: BM25Index,
+        spatial: SpatialIndex,
+        structured: StructuredIndex,
+    ):
+        self.dataset = dataset
+        self.normalized_dataset = normalized
+        self.trigrams = trigrams
+        self.bm25 = bm25
+        self.dl = DamerauLevenshteinScorer(self.normalized_dataset)
+        self.spatial = spatial
+        self.structured = structured
+        self.streets = StreetIndex(self.structured.streets)
+        self.exact_match = EXACT_MATCH
+        self.candidates = SEARCH_CANDIDATES
+        self.scorers: Dict[str, Any] = {}
+        self.cache = QueryCache()
+        # инкрементальные обновления: маска удалённых строк (None - удалений не было),
+        # число собранных строк (остальные - добавленные upsert), id добавленных строк
+        self.deleted: Optional[np.ndarray] = None
+        self.__deleted_rows = 0
+        self.__base_rows = len(dataset)
+        self.__base_id_order: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.__delta_ids: Dict[int, int] = {}
+        self.__updates = threading.Lock()
+        self.__cache_version = 0
+    
+    def tokenize(self, address: str) -> List[str]:
+        """n-граммы нормализованного адреса (те же, что в индексе BM25)"""
+        return self.__tokenize_address(address)
+    
+    def __scorer(self, name: str) -> Any:
+        """Скорер алгоритма из реестра, строится при первом использовании"""
+        if name not in self.scorers:
+            self.scorers[name] = SCORERS[name](self)
+        return self.scorers[name]
+    
+    def __weights(self, w1: float, w2: float, weights: Optional[Dict[str, float]]) -> Dict[str, float]:
+        """
+        Веса запускаемых алгоритмов в порядке DEFAULT_WEIGHTS, без нулевых.
+        Без weights - веса по умолчанию с w1 для DL и w2 для BM25.
+        """
+        if weights is None:
+            weights = {**DEFAULT_WEIGHTS, 'dl': w1, 'bm25': w2}
+        
+        known = list(DEFAULT_WEIGHTS) + [name for name in SCORERS if name not in DEFAULT_WEIGHTS]
+        unknown = set(weights) - set(known)
+        if unknown:
+            raise ValueError(f"Неизвестные алгоритмы: {', '.join(sorted(unknown))}")
+        return {name: float(weights[name]) for name in known if weights.get(name)}
+    
+    def index_stats(self) -> Dict[str, int]:
+        """Размеры индексов (для метрик)"""
+        return {
+            'rows': len(self.dataset) - self.__deleted_rows,
+            'bm25_terms': len(self.bm25.vocabulary),
+            'bm25_postings': int(self.bm25.postings.nnz),
+            'spatial_points': len(self.spatial),
+            'structured_keys': len(self.structured),
+            'streets': len(self.streets),
+            'delta_rows': len(self.dataset) - self.__base_rows,
+            'deleted_rows': self.__deleted_rows,
+        }
+    
+    def invalidate_cache(self):
+        """Сброс кэша результатов; вызывать после любого изменения индексов"""
+        # результаты, посчитанные до сброса, не попадут в кэш (см. __cache_put)
+        self.__cache_version += 1
+        self.cache.clear()
+
+    def __cache_put(self, key: Tuple, value: Tuple, version: int):
+        if version == self.__cache_version:
+            self.cache.put(key, value)
+
+    @property
+    def has_delta(self) -> bool:
+        """Есть ли изменения после сборки индексов"""
+        return len(self.dataset) > self.__base_rows or self.__deleted_rows > 0
+
+    def needs_compaction(self) -> bool:
+        """Дельта выросла настолько, что индексы пора пересобрать (compacted)"""
+        changed = len(self.dataset) - self.__base_rows + self.__deleted_rows
+        return changed > 0 and (changed >= DELTA_COMPACT_ROWS or changed > DELTA_COMPACT_RATIO * self.__base_rows)
+
+    def __live_rows(self, ids: Sequence[int]) -> Dict[int, List[int]]:
+        """Неудалённые строки каждого из ids (в собранной части id могут повторяться)"""
+        if self.__base_id_order is None:
+            base_ids = np.asarray(self.dataset.ids[:self.__base_rows])
+            order = np.argsort(base_ids, kind='stable')
+            self.__base_id_order = (order, base_ids[order])
+        order, sorted_ids = self.__base_id_order
+        deleted = self.deleted
+
+        result = {}
+        for id_ in ids:
+            start = np.searchsorted(sorted_ids, id_, side='left')
+            end = np.searchsorted(sorted_ids, id_, side='right')
+            rows = [int(row) for row in order[start:end]]
+            if id_ in self.__delta_ids:
+                rows.append(self.__delta_ids[id_])
+            if deleted is not None:
+                rows = [row for row in rows if not deleted[row]]
+            if rows:
+                result[id_] = rows
+        return result
+
+    def __delete_rows(self, rows: List[int]):
+        if not rows:
+            return
+        deleted = np.zeros(len(self.dataset), dtype=bool) if self.deleted is None else self.deleted.copy()
+        deleted[rows] = True
+        # маска модели - первой: структурный поиск и полный перебор фильтруются по ней
+        self.deleted = deleted
+        self.__deleted_rows += len(rows)
+        self.bm25.delete_documents(rows, [self.trigrams[row] for row in rows])
+        self.spatial.delete(np.asarray(rows, dtype=np.int64))
+
+    def upsert(self, records: Sequence[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Добавление или замена адресов (словари id, lat, lon, name, address) без пересборки
+        индексов: новые строки дописываются в конец, прежние строки тех же id удаляются.
+        """
+        # из повторов одного id действует последний
+        records = list({int(record['id']): record for record in records}.values())
+        if not records:
+            return {'added': 0, 'replaced': 0}
+
+        with self.__updates:
+            ids = [int(record['id']) for record in records]
+            addresses = [str(record['address']) for record in records]
+            names = [str(record.get('name') or '') for record in records]
+            lat = np.array([np.nan if record.get('lat') is None else record['lat'] for record in records], dtype=np.float64)
+            lon = np.array([np.nan if record.get('lon') is None else record['lon'] for record in records], dtype=np.float64)
+            previous = self.__live_rows(ids)
+
+            normalized = [self.__preprocess_address(address) for address in addresses]
+            # словарь индекса не меняется на месте: новые n-граммы видны вместе с постингами
+            trigrams, vocabulary = TokenColumn.encode(normalized, self.__tokenize_address, dict(self.bm25.vocabulary))
+            start = len(self.dataset)
+            rows = np.arange(start, start + len(records), dtype=np.int64)
+
+            # сначала данные строк, затем индексы: индекс не ссылается на строку, которой ещё нет
+            self.normalized_dataset.extend(normalized)
+            self.trigrams.extend(trigrams)
+            if self.deleted is not None:
+                self.deleted = np.concatenate([self.deleted, np.zeros(len(records), dtype=bool)])
+            self.dataset.extend(ids, lat, lon, names, addresses)
+
+            self.bm25.add_documents(vocabulary, [trigrams[i] for i in range(len(trigrams))])
+            self.streets.add(self.structured.add(rows, normalized))
+            self.spatial.add(rows, lat, lon)
+            for id_, row in zip(ids, rows):
+                self.__delta_ids[id_] = int(row)
+
+            self.__delete_rows([row for rows_ in previous.values() for row in rows_])
+            self.invalidate_cache()
+        return {'added': len(records) - len(previous), 'replaced': len(previous)}
+
+    def delete(self, ids: Sequence[int]) -> Dict[str, int]:
+        """Удаление адресов по id; возвращает число найденных и удалённых id"""
+        with self.__updates:
+            previous = self.__live_rows(list(dict.fromkeys(int(id_) for id_ in ids)))
+            self.__delete_rows([row for rows in previous.values() for row in rows])
+            for id_ in previous:
+                self.__delta_ids.pop(id_, None)
+            if previous:
+                self.invalidate_cache()
+        return {'deleted': len(previous)}
+
+    def compaction_state(self) -> Tuple[int, Optional[np.ndarray], Dict[str, int]]:
+        """
+        Зафиксированное состояние для compacted: число строк, маска удалённых и словарь BM25.
+        Берётся под блокировкой изменений и занимает мгновения: данные строк только дописываются,
+        маска и словарь заменяются целиком.
+        """
+        with self.__updates:
+            return len(self.dataset), self.deleted, self.bm25.vocabulary
+
+    def compacted(self, state: Optional[Tuple[int, Optional[np.ndarray], Dict[str, int]]] = None) -> 'SearchAddressModel':
+        """
+        Новая модель с пересобранными по живым строкам индексами (без дельты и удалённых строк)
+        на момент state (compaction_state, по умолчанию - текущий). Сборка идёт без блокировки:
+        текущая модель продолжает обслуживать запросы и принимать изменения, в новую они не попадают.
+        """
+        total, deleted, vocabulary = state if state is not None else self.compaction_state()
+        live = np.arange(total, dtype=np.int64) if deleted is None else np.flatnonzero(~deleted[:total])
+        dataset = self.dataset.select(live)
+        normalized = self.normalized_dataset.select(live)
+        trigrams = self.trigrams.select(live)
+
+        # n-граммы, оставшиеся только в удалённых адресах, выбрасываются; порядок остальных сохраняется
+        used = np.zeros(len(vocabulary), dtype=bool)
+        used[trigrams.ids] = True
+        remap = np.cumsum(used) - 1
+        trigrams = TokenColumn(remap[trigrams.ids].astype(np.int32), trigrams.offsets)
+        vocabulary = {term: int(remap[i]) for term, i in vocabulary.items() if used[i]}
+        bm25 = BM25Index.from_token_ids(
+            vocabulary, trigrams.ids, trigrams.offsets,
+            k1=self.bm25.k1, b=self.bm25.b, epsilon=self.bm25.epsilon,
+        )
+        structured = self.structured.select(live)
+
+        model = SearchAddressModel.__new__(SearchAddressModel)
+        model.__init_indexes(dataset, normalized, trigrams, bm25, SpatialIndex(dataset.lat, dataset.lon), structured)
+        model.exact_match = self.exact_match
+        model.candidates = self.candidates
+        return model
+
+    def cache_keys(self, limit: int) -> List[Tuple]:
+        """Ключи последних запросов из кэша (для прогрева кэша нового индекса)"""
+        return self.cache.keys(limit) if limit > 0 else []
+
+    def warm_cache(self, keys: List[Tuple]):
+        """Заполнение кэша результатами по ключам cache_keys другого экземпляра"""
+        groups: Dict[Tuple, List[str]] = {}
+        for query, top_n, weights_key in keys:
+            groups.setdefault((top_n, weights_key), []).append(query)
+        for (top_n, weights_key), queries in groups.items():
+            self.__score_normalized(queries, top_n, dict(weights_key))
+    
+    def save_snapshot(self, snapshot_path: str):
+        # снапшот хранит только собранные индексы: дельта сначала уплотняется
+        save_snapshot(self.compacted() if self.has_delta else self, snapshot_path)
     
     def __tokenize_address(self, address: str, k: int = 3) -> List[str]:
         """Токенизация адреса с n-граммами"""
@@ -189,109 +438,261 @@ class SearchAddressModel:
         result_parts.extend(building_info)
         return '_'.join(result_parts)
     
-    def __damerau_levenshtein(self, query: str, top_n: int) -> List[Tuple[int, float]]:
+    def __bm25(self, queries: List[str], top_n: int) -> List[List[Tuple[int, float]]]:
+        """BM25 по n-граммам нормализованных запросов"""
+        return self.bm25.top_n([self.__tokenize_address(query) for query in queries], top_n)
+    
+    def __fuse(
+        self,
+        scored: List[Tuple[float, List[Tuple[int, float]]]],
+        top_n: int,
+    ) -> Tuple[Tuple[int, float], ...]:
         """
-        Оптимизированная версия - сравнивает адреса как целые строки
+        Объединение результатов алгоритмов для одного запроса: scored - пары (вес, результаты).
+        Score адреса - среднее взвешенных скоров алгоритмов, которые его нашли
+        (неизменяемый результат для кэша).
         """
-        query_formatted = self.__preprocess_address(query)
-        
-        scores = []
-        for line in self.dataset.iloc[:, 5]:
-            line_formatted = self.__preprocess_address(str(line))
-            dist = distance.DamerauLevenshtein.distance(query_formatted, line_formatted)
-            scores.append(dist)
-        
-        if len(scores) == 0:
-            return []
-        
-        min_dist = min(scores)
-        max_dist = max(scores)
-        
-        if max_dist == min_dist:
-            normalized_scores = [0.5] * len(scores)
-        else:
-            normalized_scores = [1.0 - (s - min_dist) / (max_dist - min_dist) for s in scores]
-        
-        sorted_indices = np.argsort(scores)
-        top_k = min(top_n, len(self.dataset))
-        result_top_n = []
-        for idx in sorted_indices[:top_k]:
-            if normalized_scores[idx] > 0:
-                result_top_n.append((idx, normalized_scores[idx]))
-                if len(result_top_n) >= top_n:
-                    break
-        
-        return result_top_n
-    
-    def __bm25(self, query: str, top_n: int) -> List[Tuple[int, float]]:
-        query = self.__preprocess_address(query)
-        print("preprocessed query: " + query)
-        
-        query_tokens = self.__tokenize_address(query)
-        scores = self.bm25.get_scores(query_tokens)
-        max_score = max(scores)
-        top_k = min(top_n, len(self.dataset))
-        sorted_indices = np.argsort(scores)[::-1]
-        
-        result_top_n = []
-        for idx in sorted_indices[:top_k]:
-            if scores[idx] > 0:
-                result_top_n.append([idx, scores[idx]])
-                if len(result_top_n) >= top_n:
-                    break
-        
-        for i in range(len(result_top_n)):
-            result_top_n[i][1] /= max_score
-        return result_top_n
-    
-    def __score(self, query: str, top_n: int, w1: float = 1.0, w2: float = 1.0) -> List[Tuple[int, float]]:
-        """Объединение результатов двух алгоритмов"""
         combined_scores = {}
         
-        for idx, dist_score in self.__damerau_levenshtein(query, top_n * 5):
-            if idx in combined_scores:
-                combined_scores[idx][0] += dist_score * w1
-                combined_scores[idx][1] += 1
-            else:
-                combined_scores[idx] = [dist_score * w1, 1]
-        
-        for idx, bm25_score in self.__bm25(query, top_n * 5):
-            if idx in combined_scores:
-                combined_scores[idx][0] += bm25_score * w2
-                combined_scores[idx][1] += 1
-            else:
-                combined_scores[idx] = [bm25_score * w2, 1]
+        for weight, scores in scored:
+            for idx, score in scores:
+                if idx in combined_scores:
+                    combined_scores[idx][0] += score * weight
+                    combined_scores[idx][1] += 1
+                else:
+                    combined_scores[idx] = [score * weight, 1]
         
         result = [(idx, score[0] / score[1]) for idx, score in combined_scores.items()]
-        return sorted(result, key=lambda x: x[1], reverse=True)[:top_n]
+        return tuple(sorted(result, key=lambda x: x[1], reverse=True)[:top_n])
     
-    def search(self, query: str, top_n: int, w1: float = 1.0, w2: float = 1.0) -> pd.DataFrame:
-        """Возвращает DataFrame с результатами и столбцом score"""
-        scored_indices = self.__score(query, top_n, w1, w2)
-        
-        results = []
-        for idx, score in scored_indices:
-            row_data = self.dataset.iloc[idx].copy()
-            row_data['score'] = score
-            results.append(row_data)
-        
-        return pd.DataFrame(results)
+    def __score_many(
+        self,
+        queries: List[str],
+        top_n: int,
+        weights: Dict[str, float],
+    ) -> List[Tuple[Tuple[int, float], ...]]:
+        """
+        Скоринг пачки запросов алгоритмами с ненулевым весом (матрица запросы x адреса).
+        Одинаковые после нормализации запросы считаются один раз, результаты
+        кэшируются по нормализованной форме, top_n и весам.
+        """
+        with stage('normalize'):
+            normalized = [self.__preprocess_address(query) for query in queries]
+        return self.__score_normalized(normalized, top_n, weights)
+
+    def __score_normalized(
+        self,
+        normalized: List[str],
+        top_n: int,
+        weights: Dict[str, float],
+    ) -> List[Tuple[Tuple[int, float], ...]]:
+        if not weights:
+            return [() for _ in normalized]
+        weights_key = tuple(weights.items())
+        version = self.__cache_version
+        
+        fused = {}
+        with stage('cache'):
+            for query in dict.fromkeys(normalized):
+                cached = self.cache.get((query, top_n, weights_key))
+                if cached is not None:
+                    fused[query] = cached
+        # точные совпадения идут первыми; если их меньше top_n, остаток добирается нечётким поиском
+        misses = []
+        exact = {}
+        with stage('exact'):
+            for query in dict.fromkeys(normalized):
+                if query in fused:
+                    continue
+                structured = self.__structured_match(query, top_n) if self.exact_match and 'exact' in weights else None
+                if structured and len(structured) >= top_n:
+                    fused[query] = structured
+                    self.__cache_put((query, top_n, weights_key), structured, version)
+                else:
+                    exact[query] = structured or ()
+                    misses.append(query)
+        
+        names = [name for name in weights if name != 'exact']
+        if misses and names:
+            results = self.__retrieve(misses, top_n * 5, names)
+            with stage('fusion'):
+                for i, query in enumerate(misses):
+                    scored = self.__fuse([(weights[name], results[name][i]) for name in names], top_n)
+                    fused[query] = self.__with_exact(exact[query], scored, top_n)
+                    self.__cache_put((query, top_n, weights_key), fused[query], version)
+        for query in misses:
+            fused.setdefault(query, exact[query])
+        
+        return [fused[query] for query in normalized]
+    
+    @staticmethod
+    def __with_exact(
+        exact: Tuple[Tuple[int, float], ...],
+        scored: Tuple[Tuple[int, float], ...],
+        top_n: int,
+    ) -> Tuple[Tuple[int, float], ...]:
+        """Точные совпадения, затем результаты нечёткого поиска без уже найденных строк"""
+        if not exact:
+            return scored
+        rows = {idx for idx, _ in exact}
+        return exact + tuple((idx, score) for idx, score in scored if idx not in rows)[:top_n - len(exact)]
+    
+    def __structured_match(self, query: str, top_n: int) -> Optional[Tuple[Tuple[int, float], ...]]:
+        """
+        Поиск полностью определённого запроса (улица, дом, корпус) по структурному индексу.
+        Улица с опечаткой сначала исправляется по словарю улиц; точное совпадение получает
+        score 1.0, исправленное - 1 - (число правок / длина улицы).
+        None, если запрос не полностью определён или такого адреса нет.
+        """
+        parsed = parse_normalized(query)
+        if parsed is None:
+            return None
+        street, house, building = parsed
+        deleted = self.deleted
+        
+        matches = []
+        for candidate, distance in self.streets.lookup(street):
+            key = (candidate, house, building)
+            score = 1.0 - distance / max(len(street), 1)
+            matches.extend(
+                (int(row), score) for row in self.structured.lookup(*key)
+                if (deleted is None or row >= len(deleted) or not deleted[row])
+                and parse_normalized(self.normalized_dataset[int(row)]) == key
+            )
+            if len(matches) >= top_n:
+                break
+        return tuple(matches[:top_n]) or None
+    
+    def __retrieve(
+        self,
+        queries: List[str],
+        top_k: int,
+        names: List[str],
+    ) -> Dict[str, List[List[Tuple[int, float]]]]:
+        """
+        Результаты алгоритмов names для нормализованных запросов.
+        При candidates > 0 поиск двухэтапный: BM25 по инвертированному индексу отбирает
+        max(candidates, top_k) адресов, и только они перепроверяются остальными алгоритмами.
+        Иначе каждый алгоритм считается по всему корпусу.
+        """
+        rerankers = [name for name in names if name != 'bm25']
+        results = {}
+        
+        if self.candidates <= 0:
+            if 'bm25' in names:
+                with stage('bm25'):
+                    results['bm25'] = self.__bm25(queries, top_k)
+            deleted = self.deleted
+            for name in rerankers:
+                with stage(name):
+                    if deleted is None:
+                        results[name] = self.__scorer(name).top_n(queries, top_k)
+                        continue
+                    # полный перебор идёт и по удалённым строкам: берётся запас и они отбрасываются
+                    results[name] = [
+                        [(idx, score) for idx, score in scored if idx >= len(deleted) or not deleted[idx]][:top_k]
+                        for scored in self.__scorer(name).top_n(queries, top_k + self.__deleted_rows)
+                    ]
+            return results
+        
+        with stage('bm25'):
+            shortlists = self.__bm25(queries, max(self.candidates, top_k) if rerankers else top_k)
+        if 'bm25' in names:
+            results['bm25'] = [shortlist[:top_k] for shortlist in shortlists]
+        if rerankers:
+            candidates = [
+                np.fromiter((idx for idx, _ in shortlist), dtype=np.int64, count=len(shortlist))
+                for shortlist in shortlists
+            ]
+            for name in rerankers:
+                with stage(name):
+                    results[name] = self.__scorer(name).top_n_candidates(queries, candidates, top_k)
+        return results
+    
+    def __score(self, query: str, top_n: int, weights: Dict[str, float]) -> Tuple[Tuple[int, float], ...]:
+        """Объединение результатов алгоритмов для одного запроса"""
+        return self.__score_many([query], top_n, weights)[0]
+    
+    def __to_dataframe(self, scored_indices: List[Tuple[int, float]], column: str = 'score') -> pd.DataFrame:
+        """DataFrame из найденных строк хранилища с дополнительным столбцом (score / distance_m)"""
+        results = [{**self.dataset.row(idx), column: value} for idx, value in scored_indices]
+        return pd.DataFrame(results, index=[idx for idx, _ in scored_indices])
+    
+    def find_batch(
+        self,
+        queries: List[str],
+        top_n: int,
+        w1: float = 1.0,
+        w2: float = 1.0,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> List[List[AddressRecord]]:
+        """
+        Пакетный поиск без DataFrame: для каждого запроса записи AddressRecord со score
+        и разобранными при загрузке компонентами адреса.
+        """
+        weights = self.__weights(w1, w2, weights)
+        scored_many = self.__score_many(queries, top_n, weights)
+        with stage('records'):
+            return [[self.dataset.record(idx, score=score) for idx, score in scored] for scored in scored_many]
+    
+    def find(
+        self,
+        query: str,
+        top_n: int,
+        w1: float = 1.0,
+        w2: float = 1.0,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> List[AddressRecord]:
+        return self.find_batch([query], top_n, w1, w2, weights)[0]
+    
+    def search(
+        self,
+        query: str,
+        top_n: int,
+        w1: float = 1.0,
+        w2: float = 1.0,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> pd.DataFrame:
+        """
+        Возвращает DataFrame с результатами и столбцом score.
+        weights - веса алгоритмов по именам (см. DEFAULT_WEIGHTS), иначе w1 для DL и w2 для BM25.
+        """
+        return self.__to_dataframe(self.__score(query, top_n, self.__weights(w1, w2, weights)))
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        top_n: int,
+        w1: float = 1.0,
+        w2: float = 1.0,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> List[pd.DataFrame]:
+        """Пакетный поиск: DataFrame с результатами для каждого запроса в порядке входа"""
+        weights = self.__weights(w1, w2, weights)
+        return [self.__to_dataframe(scored) for scored in self.__score_many(queries, top_n, weights)]
     
     def __find_nearest_address(self, lat: float, lon: float) -> str:
-        """Находит ближайший адрес по координатам"""
-        min_distance = float('inf')
-        nearest_address = ''
+        """Находит ближайший адрес по координатам через пространственный индекс"""
+        nearest = self.spatial.nearest(lat, lon, k=1)
+        if not nearest:
+            return ''
         
-        for _, row in self.dataset.iterrows():
-            if pd.isna(row['lat']) or pd.isna(row['lon']):
-                continue
-                
-            dist = self.__haversine(lat, lon, row['lat'], row['lon'])
-            if dist < min_distance:
-                min_distance = dist
-                nearest_address = str(row.iloc[5])
-        
-        return nearest_address
+        idx, _ = nearest[0]
+        return self.dataset.address[idx]
+    
+    def nearest(self, lat: float, lon: float, limit: int = 1, radius_m: Optional[float] = None) -> List[AddressRecord]:
+        """limit ближайших адресов (в пределах radius_m) записями AddressRecord с distance_m"""
+        radius_km = radius_m / 1000.0 if radius_m is not None else None
+        with stage('spatial'):
+            nearest = self.spatial.nearest(lat, lon, k=limit, radius_km=radius_km)
+        with stage('records'):
+            return [self.dataset.record(idx, distance_m=dist_km * 1000.0) for idx, dist_km in nearest]
+    
+    def nearest_addresses(self, lat: float, lon: float, limit: int = 1, radius_m: Optional[float] = None) -> pd.DataFrame:
+        """Возвращает DataFrame с limit ближайшими адресами (в пределах radius_m) и столбцом distance_m"""
+        radius_km = radius_m / 1000.0 if radius_m is not None else None
+        nearest = self.spatial.nearest(lat, lon, k=limit, radius_km=radius_km)
+        return self.__to_dataframe([(idx, dist_km * 1000.0) for idx, dist_km in nearest], column='distance_m')
     
     def __haversine(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Вычисляет расстояние между двумя точками на Земле по формуле Haversine"""        
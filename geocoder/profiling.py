@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+# Свёрнутые стеки: кортеж кадров от корня -> собственное время, секунды
+Stacks = Dict[Tuple[str, ...], float]
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _c_label(function) -> str:
+    module = getattr(function, '__module__', None) or type(getattr(function, '__self__', None)).__name__
+    return f"{module}.{getattr(function, '__qualname__', None) or repr(function)}"
+
+
+class StackProfiler:
+    """
+    Профиль вызовов текущего потока через sys.setprofile: собственное время каждого
+    стека (включая функции на C - rapidfuzz, numpy, scipy). В отличие от сэмплера
+    не теряет коротких запросов. Работает только между start() и stop().
+    """
+
+    def __init__(self):
+        self.stacks: Stacks = {}
+        self.__stack: List[str] = []
+        self.__last = 0.0
+
+    def __event(self, frame, event, arg):
+        now = time.perf_counter()
+        if self.__stack:
+            key = tuple(self.__stack)
+            self.stacks[key] = self.stacks.get(key, 0.0) + now - self.__last
+        if event == 'call':
+            self.__stack.append(_frame_label(frame.f_code))
+        elif event == 'c_call':
+            self.__stack.append(_c_label(arg))
+        elif self.__stack:
+            # return, c_return, c_exception
+            self.__stack.pop()
+        self.__last = time.perf_counter()
+
+    def start(self):
+        self.__last = time.perf_counter()
+        sys.setprofile(self.__event)
+
+    def stop(self):
+        sys.setprofile(None)
+
+
+@contextmanager
+def profile_stacks() -> Iterator[StackProfiler]:
+    profiler = StackProfiler()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+
+
+def merge_stacks(target: Stacks, stacks: Stacks):
+    for key, seconds in stacks.items():
+        target[key] = target.get(key, 0.0) + seconds
+
+
+def collapsed(stacks: Stacks) -> str:
+    """Формат свёрнутых стеков для flamegraph.pl / speedscope: 'a;b;c микросекунды'"""
+    lines = []
+    for key, seconds in sorted(stacks.items()):
+        micros = round(seconds * 1e6)
+        if micros:
+            lines.append(f"{';'.join(label.replace(';', ':') for label in key)} {micros}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,117 @@
+"""
+Реестр алгоритмов скоринга. BM25 (отбор кандидатов) и exact (структурный индекс)
+встроены в SearchAddressModel, остальные алгоритмы - плагины: фабрика по модели
+строит скорер со своим индексом, скорер умеет top_n по всему корпусу и
+top_n_candidates по кандидатам BM25. Скореры строятся лениво, при первом запросе.
+
+Новый алгоритм:
+
+    @register_scorer('my_algorithm')
+    def _my_algorithm(model):
+        return MyScorer(model.normalized_dataset)
+"""
+import numpy as np
+from typing import Any, Callable, Dict, List, Set, Tuple
+from geocoder.bm25 import BM25Index
+from geocoder.fuzzy import JaroWinklerScorer
+from geocoder.store import TokenColumn
+
+SCORERS: Dict[str, Callable[[Any], Any]] = {}
+
+
+def register_scorer(name: str):
+    """Регистрация фабрики скорера под именем алгоритма (имя - ключ весов и поля algorithms)"""
+    def decorator(factory: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        SCORERS[name] = factory
+        return factory
+    return decorator
+
+
+class TrigramJaccardScorer:
+    """
+    Коэффициент Жаккара по множествам n-грамм запроса и адреса.
+    Множества n-грамм адресов берутся из постингов BM25 (пара терм-документ хранится один раз).
+    """
+
+    def __init__(self, bm25: BM25Index, trigrams: TokenColumn, tokenize: Callable[[str], List[str]]):
+        self.bm25 = bm25
+        self.trigrams = trigrams
+        self.tokenize = tokenize
+
+    def __query_terms(self, query: str) -> Tuple[Set[int], int]:
+        """Идентификаторы известных n-грамм запроса и размер множества всех его n-грамм"""
+        tokens = set(self.tokenize(query))
+        vocabulary = self.bm25.vocabulary
+        return {vocabulary[token] for token in tokens if token in vocabulary}, len(tokens)
+
+    @staticmethod
+    def __row_top_n(doc_ids: np.ndarray, scores: np.ndarray, top_n: int) -> List[Tuple[int, float]]:
+        positive = scores > 0
+        doc_ids = doc_ids[positive]
+        scores = scores[positive]
+        if top_n <= 0 or len(scores) == 0:
+            return []
+        top_k = min(top_n, len(scores))
+        if top_k < len(scores):
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(len(scores))
+        candidates = candidates[np.lexsort((doc_ids[candidates], -scores[candidates]))]
+        return [(int(doc_ids[i]), float(scores[i])) for i in candidates]
+
+    def top_n(self, queries: List[str], top_n: int) -> List[List[Tuple[int, float]]]:
+        results = []
+        # число различных n-грамм в каждом адресе
+        doc_sizes = self.bm25.distinct_terms()
+        deleted = self.bm25.deleted
+        for query in queries:
+            terms, size = self.__query_terms(query)
+            if not terms:
+                results.append([])
+                continue
+            # doc_sizes, deleted и term_matches читаются в разное время и при параллельном
+            # upsert могут быть разной длины: считаются только документы, которые видны в doc_sizes,
+            # добавленные позже войдут в следующие запросы
+            intersection = self.bm25.term_matches(sorted(terms))[:len(doc_sizes)]
+            if deleted is not None:
+                known = min(len(intersection), len(deleted))
+                intersection[:known][deleted[:known]] = 0
+            doc_ids = np.flatnonzero(intersection)
+            common = intersection[doc_ids]
+            scores = common / (size + doc_sizes[doc_ids] - common)
+            results.append(self.__row_top_n(doc_ids, scores, top_n))
+        return results
+
+    def top_n_candidates(
+        self,
+        queries: List[str],
+        candidates: List[np.ndarray],
+        top_n: int,
+    ) -> List[List[Tuple[int, float]]]:
+        results = []
+        for query, ids in zip(queries, candidates):
+            terms, size = self.__query_terms(query)
+            ids = np.asarray(ids, dtype=np.int64)
+            scores = np.zeros(len(ids), dtype=np.float64)
+            for pos, idx in enumerate(ids):
+                document = set(self.trigrams[int(idx)].tolist())
+                common = len(document & terms)
+                if common:
+                    scores[pos] = common / (size + len(document) - common)
+            results.append(self.__row_top_n(ids, scores, top_n))
+        return results
+
+
+@register_scorer('dl')
+def _damerau_levenshtein(model) -> Any:
+    return model.dl
+
+
+@register_scorer('jaro_winkler')
+def _jaro_winkler(model) -> Any:
+    return JaroWinklerScorer(model.normalized_dataset)
+
+
+@register_scorer('jaccard')
+def _jaccard(model) -> Any:
+    return TrigramJaccardScorer(model.bm25, model.trigrams, model.tokenize)
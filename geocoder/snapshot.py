@@ -0,0 +1,207 @@
+"""
+Снапшот индекса: колонки хранилища адресов, нормализованные адреса, n-граммы,
+BM25-постинги, структурный индекс и координаты в каталоге из .npy-файлов
+и meta.json. Загрузка не перечитывает CSV и не токенизирует адреса заново.
+
+Массивы открываются через mmap только на чтение, поэтому несколько воркеров
+uvicorn, открывших один снапшот, делят постинги, координаты и нормализованные
+адреса через page cache, а не держат каждый свою копию.
+
+    python -m geocoder.snapshot build --dataset data/dataset.csv --out data/snapshot
+    python -m geocoder.snapshot info data/snapshot
+"""
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict
+
+import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from geocoder.bm25 import BM25Index
+from geocoder.columns import StringColumn
+from geocoder.spatial import SpatialIndex, to_unit_sphere
+from geocoder.store import AddressStore, TokenColumn
+from geocoder.structured import StructuredIndex
+from geocoder.utils import *
+
+META_FILE = 'meta.json'
+
+
+def _load_array(path: str, name: str) -> np.ndarray:
+    return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+
+def _save_array(path: str, name: str, array: np.ndarray):
+    # запись во временный файл и замена: процессы, открывшие прежний снапшот через mmap,
+    # продолжают читать старый файл, а не обрезанный на месте
+    target = os.path.join(path, f'{name}.npy')
+    with open(target + '.tmp', 'wb') as f:
+        np.save(f, np.asarray(array))
+    os.replace(target + '.tmp', target)
+
+
+def _save_column(path: str, name: str, column: StringColumn):
+    _save_array(path, f'{name}.buffer', column.buffer)
+    _save_array(path, f'{name}.offsets', column.offsets)
+
+
+def _load_column(path: str, name: str) -> StringColumn:
+    """Строки без декодирования: буфер и смещения остаются в mmap"""
+    return StringColumn(_load_array(path, f'{name}.buffer'), _load_array(path, f'{name}.offsets'))
+
+
+def save_snapshot(model, path: str, source: str = ''):
+    """Сохраняет индексы загруженной SearchAddressModel в каталог path"""
+    os.makedirs(path, exist_ok=True)
+    # при пересборке на месте каталог считается недостроенным до записи нового meta.json
+    if os.path.exists(os.path.join(path, META_FILE)):
+        os.remove(os.path.join(path, META_FILE))
+
+    store = model.dataset
+    _save_array(path, 'ids', store.ids)
+    _save_array(path, 'lat', store.lat)
+    _save_array(path, 'lon', store.lon)
+    _save_column(path, 'name', store.name)
+    _save_column(path, 'address', store.address)
+    _save_column(path, 'locality', store.locality)
+    _save_column(path, 'street', store.street)
+    _save_column(path, 'number', store.number)
+    _save_column(path, 'normalized', model.normalized_dataset)
+    _save_array(path, 'trigram_ids', model.trigrams.ids)
+    _save_array(path, 'trigram_offsets', model.trigrams.offsets)
+
+    bm25 = model.bm25
+    vocabulary = sorted(bm25.vocabulary, key=bm25.vocabulary.get)
+    _save_column(path, 'bm25_vocabulary', StringColumn.from_list(vocabulary))
+    _save_array(path, 'bm25_idf', bm25.idf)
+    _save_array(path, 'bm25_doc_len', bm25.doc_len)
+    _save_array(path, 'bm25_indptr', bm25.postings.indptr)
+    _save_array(path, 'bm25_indices', bm25.postings.indices)
+    _save_array(path, 'bm25_data', bm25.postings.data)
+
+    _save_array(path, 'structured_keys', model.structured.keys)
+    _save_array(path, 'structured_rows', model.structured.rows)
+    _save_column(path, 'structured_streets', StringColumn.from_list(model.structured.streets))
+
+    spatial = model.spatial
+    _save_array(path, 'spatial_row_ids', spatial.row_ids)
+    _save_array(path, 'spatial_lat', spatial.lat)
+    _save_array(path, 'spatial_lon', spatial.lon)
+    _save_array(path, 'spatial_xyz', to_unit_sphere(spatial.lat, spatial.lon))
+
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'created_at': time.time(),
+        'source': source,
+        'rows': len(store),
+        'bm25': {
+            'k1': bm25.k1,
+            'b': bm25.b,
+            'epsilon': bm25.epsilon,
+            'avgdl': bm25.avgdl,
+            'vocabulary_size': len(vocabulary),
+        },
+    }
+    # meta.json пишется последним: каталог без него считается недостроенным
+    with open(os.path.join(path, META_FILE + '.tmp'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(os.path.join(path, META_FILE + '.tmp'), os.path.join(path, META_FILE))
+
+
+def read_meta(path: str) -> Dict[str, Any]:
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        raise ValueError(f"Снапшот не найден или не достроен: {path}")
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Версия снапшота {meta.get('version')} не поддерживается (ожидается {SNAPSHOT_VERSION})"
+        )
+    return meta
+
+
+def load_snapshot(path: str) -> Dict[str, Any]:
+    """Читает снапшот: хранилище адресов, нормализованные адреса, n-граммы, BM25 и пространственный индекс"""
+    meta = read_meta(path)
+
+    store = AddressStore(
+        _load_array(path, 'ids'),
+        _load_array(path, 'lat'),
+        _load_array(path, 'lon'),
+        _load_column(path, 'name'),
+        _load_column(path, 'address'),
+        _load_column(path, 'locality'),
+        _load_column(path, 'street'),
+        _load_column(path, 'number'),
+    )
+
+    params = meta['bm25']
+    postings = sparse.csr_matrix(
+        (_load_array(path, 'bm25_data'), _load_array(path, 'bm25_indices'), _load_array(path, 'bm25_indptr')),
+        shape=(params['vocabulary_size'], meta['rows']),
+    )
+    bm25 = BM25Index.from_arrays(
+        _load_column(path, 'bm25_vocabulary').to_list(),
+        _load_array(path, 'bm25_idf'),
+        postings,
+        _load_array(path, 'bm25_doc_len'),
+        params['avgdl'],
+        k1=params['k1'],
+        b=params['b'],
+        epsilon=params['epsilon'],
+    )
+
+    # дерево строится поверх точек из mmap без копирования: в памяти процесса только узлы
+    xyz = _load_array(path, 'spatial_xyz')
+    tree = cKDTree(xyz, copy_data=False, balanced_tree=False) if len(xyz) else None
+    spatial = SpatialIndex.from_tree(
+        tree,
+        _load_array(path, 'spatial_row_ids'),
+        _load_array(path, 'spatial_lat'),
+        _load_array(path, 'spatial_lon'),
+    )
+
+    return {
+        'meta': meta,
+        'dataset': store,
+        'normalized': _load_column(path, 'normalized'),
+        'trigrams': TokenColumn(_load_array(path, 'trigram_ids'), _load_array(path, 'trigram_offsets')),
+        'bm25': bm25,
+        'spatial': spatial,
+        'structured': StructuredIndex(
+            _load_array(path, 'structured_keys'),
+            _load_array(path, 'structured_rows'),
+            _load_column(path, 'structured_streets').to_list(),
+        ),
+    }
+
+
+def main():
+    from geocoder.model import SearchAddressModel
+
+    parser = argparse.ArgumentParser(description="Сборка и просмотр снапшота индекса геокодера")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="Собрать снапшот из CSV")
+    build.add_argument('--dataset', default='./data/' + DATASET_NAME)
+    build.add_argument('--out', required=True)
+    info = commands.add_parser('info', help="Показать meta.json снапшота")
+    info.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        model = SearchAddressModel(args.dataset)
+        print(f"Индекс построен за {time.perf_counter() - start:.2f}s, строк: {len(model.dataset)}")
+        start = time.perf_counter()
+        save_snapshot(model, args.out, source=os.path.abspath(args.dataset))
+        print(f"Снапшот сохранён в {args.out} за {time.perf_counter() - start:.2f}s")
+    else:
+        print(json.dumps(read_meta(args.path), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
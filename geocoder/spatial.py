@@ -0,0 +1,126 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from typing import List, Optional, Tuple
+from geocoder.utils import *
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Векторизованная формула Haversine, расстояние в километрах"""
+    lat1 = np.radians(lat1)
+    lon1 = np.radians(lon1)
+    lat2 = np.radians(lat2)
+    lon2 = np.radians(lon2)
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def to_unit_sphere(lat, lon) -> np.ndarray:
+    """Перевод широты/долготы в координаты точки на единичной сфере (x, y, z)"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class SpatialIndex:
+    """
+    KD-дерево по точкам на единичной сфере. Евклидова (хордовая) метрика монотонна
+    по расстоянию на сфере, поэтому поиск ближайших идёт за O(log N), а кандидаты
+    перепроверяются точной формулой Haversine.
+
+    Точки, добавленные после сборки (add), перебираются полным перебором, удалённые
+    строки (delete) отбрасываются из выдачи; дерево не перестраивается до уплотнения.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, candidates: int = SPATIAL_CANDIDATES):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+
+        self.row_ids = np.flatnonzero(valid)
+        self.lat = lat[valid]
+        self.lon = lon[valid]
+        self.candidates = candidates
+        self.tree = cKDTree(to_unit_sphere(self.lat, self.lon)) if len(self.row_ids) else None
+        self.__reset_delta()
+
+    def __reset_delta(self):
+        # (строки, широты, долготы добавленных точек, отсортированные удалённые строки) - заменяется целиком
+        empty = np.zeros(0, dtype=np.float64)
+        self.__delta = (np.zeros(0, dtype=np.int64), empty, empty, np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def from_tree(cls, tree: Optional[cKDTree], row_ids: np.ndarray, lat: np.ndarray, lon: np.ndarray,
+                  candidates: int = SPATIAL_CANDIDATES) -> 'SpatialIndex':
+        """Индекс из готового дерева (например, из снапшота) без перестроения"""
+        index = cls.__new__(cls)
+        index.row_ids = row_ids
+        index.lat = lat
+        index.lon = lon
+        index.candidates = candidates
+        index.tree = tree
+        index.__reset_delta()
+        return index
+
+    def __len__(self) -> int:
+        rows, _, _, deleted = self.__delta
+        return len(self.row_ids) + len(rows) - len(deleted)
+
+    def add(self, rows: np.ndarray, lat: np.ndarray, lon: np.ndarray):
+        """Добавление точек строк rows (строки без координат пропускаются)"""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        delta_rows, delta_lat, delta_lon, deleted = self.__delta
+        self.__delta = (
+            np.concatenate([delta_rows, np.asarray(rows, dtype=np.int64)[valid]]),
+            np.concatenate([delta_lat, lat[valid]]),
+            np.concatenate([delta_lon, lon[valid]]),
+            deleted,
+        )
+
+    def delete(self, rows: np.ndarray):
+        """Исключение строк rows из выдачи"""
+        delta_rows, delta_lat, delta_lon, deleted = self.__delta
+        self.__delta = (delta_rows, delta_lat, delta_lon, np.union1d(deleted, np.asarray(rows, dtype=np.int64)))
+
+    def nearest(self, lat: float, lon: float, k: int = 1, radius_km: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        k ближайших строк датасета: пары (idx, расстояние в км) по возрастанию расстояния.
+        Если задан radius_km, возвращаются только точки в пределах радиуса.
+        """
+        delta_rows, delta_lat, delta_lon, deleted = self.__delta
+        if k <= 0 or (self.tree is None and len(delta_rows) == 0):
+            return []
+
+        rows = np.zeros(0, dtype=np.int64)
+        distances = np.zeros(0, dtype=np.float64)
+        if self.tree is not None:
+            # с запасом на удалённые строки, которые могут оказаться среди ближайших
+            n = min(max(k, self.candidates) + len(deleted), len(self.row_ids))
+            upper_bound = np.inf
+            if radius_km is not None:
+                # хорда, соответствующая дуге radius_km, с запасом на погрешность
+                upper_bound = 2 * np.sin(min(radius_km / R, np.pi) / 2) * (1 + 1e-9) + 1e-12
+
+            chords, positions = self.tree.query(to_unit_sphere(lat, lon), k=n, distance_upper_bound=upper_bound)
+            chords = np.atleast_1d(chords)
+            positions = np.atleast_1d(positions)[np.isfinite(chords)]
+            rows = self.row_ids[positions]
+            distances = haversine(lat, lon, self.lat[positions], self.lon[positions])
+
+        if len(delta_rows):
+            rows = np.concatenate([rows, delta_rows])
+            distances = np.concatenate([distances, haversine(lat, lon, delta_lat, delta_lon)])
+        if len(deleted):
+            live = ~np.isin(rows, deleted)
+            rows = rows[live]
+            distances = distances[live]
+        if radius_km is not None:
+            within = distances <= radius_km
+            rows = rows[within]
+            distances = distances[within]
+
+        order = np.lexsort((rows, distances))[:k]
+        return [(int(rows[i]), float(distances[i])) for i in order]
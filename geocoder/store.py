@@ -0,0 +1,231 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from geocoder.columns import StringColumn, gather_ranges
+
+
+def parse_address(address_str: str) -> Tuple[str, str, str]:
+    """
+    Разбирает адрес датасета на населённый пункт, улицу и номер дома (с корпусом).
+    """
+    locality = ""
+    street = ""
+    number = ""
+    building = ""
+    parts = address_str.split(' ')
+    i = 0
+    while i < len(parts):
+        part = parts[i]
+        if part == 'город' and i + 1 < len(parts):
+            locality = parts[i + 1].capitalize()
+            i += 2
+        elif part == 'улица' and i + 1 < len(parts):
+            street_parts = []
+            i += 1
+            while i < len(parts):
+                if (parts[i].startswith("дом") or parts[i].startswith("корпус")):
+                    break
+                for elem in parts[i].capitalize().split('_'):
+                    street_parts.append(elem)
+                i += 1
+            street = " ".join(street_parts)
+        elif part.startswith('дом'):
+            num = part[3:]
+            if not num and i + 1 < len(parts):
+                number = parts[i + 1]
+                i += 2
+            else:
+                number = num
+                i += 1
+        elif part.startswith('корпус'):
+            bldg = part[6:]
+            if not bldg and i + 1 < len(parts):
+                building = parts[i + 1]
+                i += 2
+            else:
+                building = bldg
+                i += 1
+        else:
+            i += 1
+    full_number = number
+    if building:
+        full_number = f"{number} корп.{building}" if number else f"корп.{building}"
+
+    return locality or "Москва", street, full_number
+
+
+class AddressRecord(NamedTuple):
+    """Найденный адрес: строка хранилища с разобранными компонентами и score / distance_m"""
+    idx: int
+    id: int
+    lat: float
+    lon: float
+    name: str
+    address: str
+    locality: str
+    street: str
+    number: str
+    score: Optional[float] = None
+    distance_m: Optional[float] = None
+
+
+class TokenColumn:
+    """
+    n-граммы адресов как целочисленные идентификаторы термов: общий массив ids
+    и смещения начала каждого документа (вместо списка списков строк).
+    Документы, добавленные после сборки (extend), лежат в списке tail до select.
+    """
+
+    def __init__(self, ids: np.ndarray, offsets: np.ndarray):
+        self.ids = ids
+        self.offsets = offsets
+        self.tail: List[np.ndarray] = []
+
+    @classmethod
+    def encode(
+        cls,
+        documents: Sequence[str],
+        tokenize: Callable[[str], List[str]],
+        vocabulary: Optional[Dict[str, int]] = None,
+    ) -> Tuple['TokenColumn', Dict[str, int]]:
+        """Токенизация документов с пополнением словаря n-грамма -> id"""
+        vocabulary = {} if vocabulary is None else vocabulary
+        ids = []
+        offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+        for i, document in enumerate(documents):
+            tokens = tokenize(document)
+            ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+            offsets[i + 1] = offsets[i] + len(tokens)
+        return cls(np.asarray(ids, dtype=np.int32), offsets), vocabulary
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1 + len(self.tail)
+
+    def __getitem__(self, idx: int) -> np.ndarray:
+        packed = len(self.offsets) - 1
+        if idx >= packed:
+            return self.tail[idx - packed]
+        return self.ids[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def extend(self, column: 'TokenColumn'):
+        self.tail.extend(column[i] for i in range(len(column)))
+
+    def select(self, indices: Sequence[int]) -> 'TokenColumn':
+        """Новая колонка из документов indices (вместе с добавленными)"""
+        ids, offsets = self.ids, self.offsets
+        # копия списка: документы могут дописываться параллельно
+        tail = list(self.tail)
+        if tail:
+            ids = np.concatenate([ids, *tail]).astype(np.int32)
+            offsets = np.concatenate([offsets, offsets[-1] + np.cumsum([len(doc) for doc in tail])])
+        return TokenColumn(*gather_ranges(ids, offsets, indices))
+
+
+class AddressStore:
+    """
+    Колоночное хранилище датасета: координаты в float64-массивах, адреса и названия
+    в упакованных UTF-8 буферах со смещениями. Заменяет pandas DataFrame в модели.
+    Компоненты адреса (населённый пункт, улица, номер) разбираются один раз при загрузке.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        name: StringColumn,
+        address: StringColumn,
+        locality: StringColumn,
+        street: StringColumn,
+        number: StringColumn,
+    ):
+        self.ids = ids
+        self.lat = lat
+        self.lon = lon
+        self.name = name
+        self.address = address
+        self.locality = locality
+        self.street = street
+        self.number = number
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'AddressStore':
+        """Чтение data/dataset.csv: адрес - 6-я колонка, координаты - lat/lon, название - name"""
+        frame = pd.read_csv(path)
+        ids = frame['id'].to_numpy(dtype=np.int64) if 'id' in frame else np.arange(len(frame), dtype=np.int64)
+        names = frame['name'].fillna('').astype(str).tolist() if 'name' in frame else [''] * len(frame)
+        addresses = frame.iloc[:, 5].fillna('').astype(str).tolist()
+        localities, streets, numbers = zip(*map(parse_address, addresses)) if addresses else ((), (), ())
+        return cls(
+            ids,
+            frame['lat'].to_numpy(dtype=np.float64),
+            frame['lon'].to_numpy(dtype=np.float64),
+            StringColumn.from_list(names),
+            StringColumn.from_list(addresses),
+            StringColumn.from_list(list(localities)),
+            StringColumn.from_list(list(streets)),
+            StringColumn.from_list(list(numbers)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def extend(
+        self,
+        ids: Sequence[int],
+        lat: Sequence[float],
+        lon: Sequence[float],
+        names: Sequence[str],
+        addresses: Sequence[str],
+    ):
+        """Добавление строк в конец хранилища (колонки строк - в tail, массивы копируются)"""
+        localities, streets, numbers = zip(*map(parse_address, addresses)) if addresses else ((), (), ())
+        for column, values in (
+            (self.name, names), (self.address, addresses),
+            (self.locality, localities), (self.street, streets), (self.number, numbers),
+        ):
+            column.extend(values)
+        self.lat = np.concatenate([self.lat, np.asarray(lat, dtype=np.float64)])
+        self.lon = np.concatenate([self.lon, np.asarray(lon, dtype=np.float64)])
+        # ids - последними: по ним считается длина хранилища
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+
+    def select(self, indices: np.ndarray) -> 'AddressStore':
+        """Новое хранилище из строк indices в их порядке"""
+        return AddressStore(
+            np.asarray(self.ids)[indices],
+            np.asarray(self.lat)[indices],
+            np.asarray(self.lon)[indices],
+            self.name.select(indices),
+            self.address.select(indices),
+            self.locality.select(indices),
+            self.street.select(indices),
+            self.number.select(indices),
+        )
+
+    def row(self, idx: int) -> Dict[str, Any]:
+        return {
+            'id': int(self.ids[idx]),
+            'lat': float(self.lat[idx]),
+            'lon': float(self.lon[idx]),
+            'name': self.name[idx],
+            'address': self.address[idx],
+        }
+
+    def record(self, idx: int, score: Optional[float] = None, distance_m: Optional[float] = None) -> AddressRecord:
+        return AddressRecord(
+            int(idx),
+            int(self.ids[idx]),
+            float(self.lat[idx]),
+            float(self.lon[idx]),
+            self.name[idx],
+            self.address[idx],
+            self.locality[idx],
+            self.street[idx],
+            self.number[idx],
+            score,
+            distance_m,
+        )
+
+    def addresses(self) -> List[str]:
+        return self.address.to_list()
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from rapidfuzz.distance import DamerauLevenshtein
+from typing import Dict, List, Set, Tuple
+from geocoder.utils import *
+
+
+class StreetIndex:
+    """
+    Словарь удалений (SymSpell) по уникальным названиям улиц: исправление опечатки
+    в улице без прохода по всем адресам. Удаления строятся по префиксу длины
+    prefix_length, кандидаты проверяются полным расстоянием Дамерау-Левенштейна.
+    """
+
+    def __init__(
+        self,
+        streets: List[str],
+        max_distance: int = STREET_MAX_EDIT_DISTANCE,
+        prefix_length: int = STREET_PREFIX_LENGTH,
+    ):
+        self.streets = list(streets)
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.deletes: Dict[str, List[int]] = defaultdict(list)
+        for idx, street in enumerate(self.streets):
+            for variant in self.__deletes(street[:prefix_length]):
+                self.deletes[variant].append(idx)
+        self.deletes = dict(self.deletes)
+
+    def __len__(self) -> int:
+        return len(self.streets)
+
+    def add(self, streets: List[str]):
+        """Добавление новых улиц (без повторов уже известных)"""
+        # сначала улицы, потом ссылки на них: параллельный lookup не встретит номер без улицы
+        start = len(self.streets)
+        self.streets.extend(streets)
+        for idx, street in enumerate(streets, start):
+            for variant in self.__deletes(street[:self.prefix_length]):
+                self.deletes.setdefault(variant, []).append(idx)
+
+    def __deletes(self, word: str) -> Set[str]:
+        """Все строки, получаемые из word удалением не более max_distance символов"""
+        variants = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {
+                variant[:i] + variant[i + 1:]
+                for variant in frontier
+                for i in range(len(variant))
+            }
+            variants |= frontier
+        return variants
+
+    def __allowed_distance(self, street: str) -> int:
+        """Для коротких названий допускается меньше правок, иначе они исправляются в случайную улицу"""
+        return min(self.max_distance, max(len(street) // 4, 0))
+
+    def lookup(self, street: str) -> List[Tuple[str, int]]:
+        """
+        Улицы на расстоянии не больше допустимого, по возрастанию расстояния.
+        Точное совпадение - расстояние 0.
+        """
+        max_distance = self.__allowed_distance(street)
+        candidates = set()
+        for variant in self.__deletes(street[:self.prefix_length]):
+            candidates.update(self.deletes.get(variant, ()))
+
+        matches = []
+        for idx in candidates:
+            candidate = self.streets[idx]
+            if abs(len(candidate) - len(street)) > max_distance:
+                continue
+            distance = DamerauLevenshtein.distance(street, candidate, score_cutoff=max_distance)
+            if distance <= max_distance:
+                matches.append((candidate, distance))
+        return sorted(matches, key=lambda item: (item[1], item[0]))
@@ -0,0 +1,112 @@
+import hashlib
+import re
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# город_москва_улица_{улица}_дом{номер}_{корпус/строение/литера...} - формат __preprocess_address
+NORMALIZED_PATTERN = re.compile(
+    r'^город_[^_]+_улица(?:_(?P<street>.+?))?(?:_дом(?P<house>\d+))?(?P<building>(?:_(?:корпус|строение|литера)[^_]*)*)$'
+)
+
+
+def parse_normalized(normalized: str) -> Optional[Tuple[str, str, str]]:
+    """
+    (улица, номер дома, корпус/строение) из нормализованного адреса.
+    None, если адрес не полностью определён (нет улицы или номера дома).
+    """
+    match = NORMALIZED_PATTERN.match(normalized)
+    if match is None or not match.group('street') or not match.group('house'):
+        return None
+    return match.group('street'), match.group('house'), match.group('building').lstrip('_')
+
+
+def structured_key(street: str, house: str, building: str = '') -> int:
+    """Стабильный между процессами 64-битный хэш компонентов адреса"""
+    digest = hashlib.blake2b(f'{street}\x00{house}\x00{building}'.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class StructuredIndex:
+    """
+    Индекс точного совпадения улица + дом + корпус -> строки датасета.
+    Ключи - 64-битные хэши компонентов в отсортированном массиве (его можно
+    хранить в снапшоте и открывать через mmap), поиск - бинарный по массиву.
+    Строки, добавленные после сборки, лежат в словаре delta (заменяется целиком
+    при каждом добавлении); удалённые строки фильтрует вызывающий код.
+    """
+
+    def __init__(self, keys: np.ndarray, rows: np.ndarray, streets: List[str]):
+        self.keys = keys
+        self.rows = rows
+        self.streets = streets
+        self.delta: Dict[int, List[int]] = {}
+
+    @classmethod
+    def build(cls, normalized: Iterable[str]) -> 'StructuredIndex':
+        keys = []
+        rows = []
+        streets = {}
+        for row, address in enumerate(normalized):
+            parsed = parse_normalized(address)
+            if parsed is None:
+                continue
+            street, house, building = parsed
+            keys.append(structured_key(street, house, building))
+            rows.append(row)
+            streets[street] = None
+
+        keys = np.asarray(keys, dtype=np.uint64)
+        rows = np.asarray(rows, dtype=np.int64)
+        order = np.argsort(keys, kind='stable')
+        return cls(keys[order], rows[order], list(streets))
+
+    def __len__(self) -> int:
+        return len(self.keys) + sum(len(rows) for rows in self.delta.values())
+
+    def add(self, rows: Sequence[int], normalized: Sequence[str]) -> List[str]:
+        """Добавление строк rows с нормализованными адресами normalized; возвращает новые улицы"""
+        delta = {key: list(value) for key, value in self.delta.items()}
+        known = set(self.streets)
+        streets = []
+        for row, address in zip(rows, normalized):
+            parsed = parse_normalized(address)
+            if parsed is None:
+                continue
+            street, house, building = parsed
+            delta.setdefault(structured_key(street, house, building), []).append(int(row))
+            if street not in known:
+                known.add(street)
+                streets.append(street)
+        self.delta = delta
+        self.streets = self.streets + streets
+        return streets
+
+    def select(self, live: np.ndarray) -> 'StructuredIndex':
+        """Индекс по строкам live (отсортированный массив) с перенумерацией строк 0..len(live)-1"""
+        keys = np.concatenate([
+            self.keys,
+            np.fromiter((key for key, rows in self.delta.items() for _ in rows), dtype=np.uint64),
+        ])
+        rows = np.concatenate([
+            self.rows,
+            np.fromiter((row for rows in self.delta.values() for row in rows), dtype=np.int64),
+        ])
+        positions = np.searchsorted(live, rows)
+        kept = (positions < len(live)) & (live[np.minimum(positions, len(live) - 1)] == rows) if len(live) else \
+            np.zeros(len(rows), dtype=bool)
+        keys = keys[kept]
+        rows = positions[kept].astype(np.int64)
+        order = np.lexsort((rows, keys))
+        # улицы удалённых адресов остаются: лишняя улица в исправлении опечаток ничего не ломает
+        return StructuredIndex(keys[order], rows[order], list(self.streets))
+
+    def lookup(self, street: str, house: str, building: str = '') -> np.ndarray:
+        """Строки датасета с точно таким адресом (может быть пусто); коллизии хэша не отфильтрованы"""
+        key = np.uint64(structured_key(street, house, building))
+        start = np.searchsorted(self.keys, key, side='left')
+        end = np.searchsorted(self.keys, key, side='right')
+        rows = self.rows[start:end]
+        added = self.delta.get(int(key))
+        if added:
+            rows = np.concatenate([rows, np.asarray(added, dtype=np.int64)])
+        return rows
@@ -0,0 +1,34 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+_local = threading.local()
+
+
+@contextmanager
+def collect_stages() -> Iterator[Dict[str, float]]:
+    """
+    Сбор длительностей этапов (секунды) внутри блока в словарь, в текущем потоке.
+    Вне collect_stages замеры stage() ничего не делают.
+    """
+    previous = getattr(_local, 'timings', None)
+    _local.timings = timings = {}
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Замер этапа; повторные замеры одного этапа суммируются"""
+    timings = getattr(_local, 'timings', None)
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
@@ -137,4 +137,62 @@ REPLACEMENTS = {
     'стр.': 'строение',
     'торг.зал': 'торговый_зал',
     'цех': 'цех'
-}
\ No newline at end of file
+}
+
+# Damerau-Levenshtein: потоки rapidfuzz (-1 = все ядра) и порог раннего выхода
+# (None = считать расстояния полностью). Порог включается только явно: расстояния выше
+# него rapidfuzz заменяет на порог + 1, а оценка DL нормализуется по min/max строки,
+# поэтому с любым порогом меняются оценки и может измениться ранжирование после слияния с BM25
+DL_WORKERS = -1
+DL_SCORE_CUTOFF = None
+
+# Сколько строк корпуса декодировать за раз, если адреса лежат в mmap (StringColumn)
+DL_CHOICES_CHUNK = 200_000
+
+# Быстрый путь: полностью определённый запрос (улица + дом) ищется точным совпадением
+# по структурному индексу; найденные адреса идут первыми, нечёткий поиск добирает
+# остальные места до top_n и не запускается, если точных совпадений хватило
+EXACT_MATCH = True
+
+# Веса алгоритмов по умолчанию (geocoder/scorers.py): нулевой вес - алгоритм не запускается.
+# exact - быстрый путь по структурному индексу, его совпадения идут первыми в выдаче
+DEFAULT_WEIGHTS = {
+    'dl': 1.0,
+    'bm25': 1.0,
+    'exact': 1.0,
+    'jaro_winkler': 0.0,
+    'jaccard': 0.0,
+}
+
+# Исправление опечаток в названии улицы (geocoder/streets.py): максимум правок
+# и длина префикса, по которому строится словарь удалений
+STREET_MAX_EDIT_DISTANCE = 2
+STREET_PREFIX_LENGTH = 7
+
+# Двухэтапный поиск: сколько кандидатов BM25 перепроверять Дамерау-Левенштейном
+# (0 - DL по всему корпусу, как в однопроходном режиме)
+SEARCH_CANDIDATES = 300
+
+# Лимит ячеек матрицы (запросы x корпус) на один проход пакетного скоринга
+MAX_MATRIX_CELLS = 32_000_000
+
+# Сколько ближайших по хорде кандидатов KD-дерева перепроверять точной формулой Haversine
+SPATIAL_CANDIDATES = 8
+
+# Потоковое пакетное геокодирование: размер пачки, число потоков и
+# максимум пачек в обработке (дальше чтение входа приостанавливается)
+BULK_CHUNK_SIZE = 1000
+BULK_WORKERS = 2
+BULK_MAX_IN_FLIGHT = 4
+
+# Версия формата снапшота индекса (geocoder/snapshot.py), менять при несовместимых изменениях
+SNAPSHOT_VERSION = 5
+
+# Кэш результатов поиска по нормализованному запросу: размер (0 - выключен) и TTL в секундах
+QUERY_CACHE_SIZE = 10_000
+QUERY_CACHE_TTL = 3600
+
+# Инкрементальные обновления (upsert / delete): уплотнение индексов, когда добавленных
+# и удалённых строк больше DELTA_COMPACT_ROWS или доли DELTA_COMPACT_RATIO от собранных
+DELTA_COMPACT_ROWS = 10_000
+DELTA_COMPACT_RATIO = 0.05